@@ -92,10 +92,65 @@ def histogram(release_period_df):
     plt.show()
 
 
+def cadence_graphs(cadence_df):
+    '''
+    Plots the distributions of the release cadences of the top 50 podcasts in the US in 2021:
+    median gap between episodes, longest hiatus and share of weeks with a release
+    :param cadence_df: Pandas dataframe containing the release cadence of each podcast
+    :return: None
+    '''
+
+    '''
+    Plot data
+    '''
+    fig, axes = plt.subplots(1, 3, figsize=(15, 5))
+
+    # List out preset inputs for each panel
+    panel_cols = ['median_gap_days', 'longest_hiatus_days', 'weekly_release_share']
+    panel_titles = ['Median Gap between Episodes', 'Longest Hiatus', 'Share of Weeks with a Release']
+    panel_labels = ['Median Gap (days)', 'Longest Hiatus (days)', 'Share of Weeks with a Release (%)']
+    panel_scales = [1, 1, 100]
+
+    for ax, col, title, label, scale in zip(axes, panel_cols, panel_titles, panel_labels, panel_scales):
+        # Plot the distribution
+        data = cadence_df[col].dropna() * scale
+        sns.histplot(data, color="#6F84FF", kde=False, alpha=0.6, edgecolor="white", linewidth=1, bins=15, ax=ax)
+
+        # Plot median
+        ax.axvline(x=data.median(), color="black", alpha=1, linewidth=3, linestyle='--')
+        ax.text(data.median(), ax.get_ylim()[1]*0.9, 'Median:\n' + str(round(data.median(), 1)),
+                fontdict={'fontsize': 11, 'fontweight': 'semibold', },
+                horizontalalignment='center', color='black',
+                bbox=dict(facecolor='w', edgecolor='#f0f0f0', boxstyle='round,pad=0.5'))
+
+        '''
+        Format graph
+        '''
+        # Add title and label axes
+        ax.set_title(title, fontsize=14, fontweight='semibold')
+        ax.set_xlabel(label, fontdict={'fontsize': 12}, horizontalalignment="center")
+        ax.set_ylabel("Frequency", fontdict={'fontsize': 12}, horizontalalignment="center")
+        ax.yaxis.set_minor_locator(MultipleLocator(1))
+
+    # Set overall title
+    fig.suptitle('Release Cadence of the Top 50 Podcasts in the U.S. in 2021', fontsize=16, fontweight='semibold')
+
+    # Add footnotes
+    fig.text(0.02, -0.02,
+             'Gaps are measured between consecutive episode release dates; share of weeks with a release is measured '
+             'between the first and most recent episodes'
+             '\nData Sources: U.S. Top 50 Podcasts Q1 2021 - Q4 2021 by Edison Research, Spotify Podcasts API'
+             '\nCreated by: Adaora (uploading.substack.com)',
+             verticalalignment='top', fontsize=8)
+
+    plt.show()
+
+
 if __name__ == "__main__":
     # Load data
     pie_chart_df = pd.read_csv('data/processed_publisher_data.csv', index_col=0)
     release_period_df = pd.read_csv('data/podcast_release_periods.csv', index_col=0)
+    cadence_df = pd.read_csv('data/podcast_release_cadence.csv', index_col=0)
     '''
     Generate pie chart 
     '''
@@ -105,3 +160,8 @@ if __name__ == "__main__":
     Generate histogram 
     '''
     histogram(release_period_df)
+
+    '''
+    Generate release cadence graphs
+    '''
+    cadence_graphs(cadence_df)
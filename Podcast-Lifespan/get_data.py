@@ -1,96 +1,571 @@
 import pandas as pd
+import numpy as np
 import requests
 import time
-import math
+import threading
+import sqlite3
+import os
+from concurrent.futures import ThreadPoolExecutor
 
-def get_all_episode_data(token, column_names, id_df):
+# Spotify Web API base url (can be pointed at a local stand-in server for offline runs)
+SPOTIFY_API_URL = 'https://api.spotify.com/v1'
+
+class CrawlCheckpoint:
     '''
-    Get all episodes (on Spotify) for each podcast in df
-    :param id_df: Pandas dataframe with podcast Spotify IDs
-    :return: episodes_df: Pandas dataframe with all episode data
+    Durable record (in a SQLite database) of crawl progress: the next offset to fetch for each podcast,
+    which podcasts are complete, each podcast's latest known episode (used by incremental syncs)
+    and how much of the csv file has been written
+    '''
+
+    def __init__(self, path):
+        '''
+        :param path: (string) SQLite database file (created if it doesn't exist)
+        '''
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute('CREATE TABLE IF NOT EXISTS podcasts (podcast_id TEXT PRIMARY KEY, '
+                                'next_offset INTEGER, total INTEGER, completed INTEGER)')
+        self.connection.execute('CREATE TABLE IF NOT EXISTS csv_file (id INTEGER PRIMARY KEY CHECK (id = 0), '
+                                'num_bytes INTEGER, num_rows INTEGER)')
+        self.connection.execute('CREATE TABLE IF NOT EXISTS latest_episodes (podcast_id TEXT PRIMARY KEY, '
+                                'episode_id TEXT, release_date TEXT)')
+        self.connection.commit()
+
+    def get_progress(self):
+        '''
+        :return: (dictionary) podcast ID -> (next offset, total # of episodes, completed flag)
+        '''
+        rows = self.connection.execute('SELECT podcast_id, next_offset, total, completed FROM podcasts')
+        return {podcast_id: (next_offset, total, bool(completed)) for podcast_id, next_offset, total, completed in rows}
+
+    def get_latest_episodes(self):
+        '''
+        :return: (dictionary) podcast ID -> (episode ID, release date) of the newest episode saved
+        '''
+        rows = self.connection.execute('SELECT podcast_id, episode_id, release_date FROM latest_episodes')
+        return {podcast_id: (episode_id, release_date) for podcast_id, episode_id, release_date in rows}
+
+    def get_csv_file(self):
+        '''
+        :return: (tuple) (# of bytes, # of rows) in the csv file as of the last checkpoint, or None if there isn't one
+        '''
+        return self.connection.execute('SELECT num_bytes, num_rows FROM csv_file').fetchone()
+
+    def clear(self):
+        '''
+        Delete all crawl progress (used when the csv file is started over)
+        :return: None
+        '''
+        with self.connection:
+            self.connection.execute('DELETE FROM podcasts')
+            self.connection.execute('DELETE FROM csv_file')
+            self.connection.execute('DELETE FROM latest_episodes')
+
+    def save(self, progress, num_bytes, num_rows, latest_episodes=None):
+        '''
+        Save crawl progress in one transaction
+        :param progress: (dictionary) podcast ID -> (next offset, total # of episodes, completed flag)
+        :param num_bytes: (int) # of bytes in the csv file
+        :param num_rows: (int) # of rows in the csv file
+        :param latest_episodes: (dictionary) podcast ID -> (episode ID, release date) of the newest episode saved
+        :return: None
+        '''
+        with self.connection:
+            self.connection.executemany('INSERT OR REPLACE INTO podcasts VALUES (?, ?, ?, ?)',
+                                        [(podcast_id, next_offset, total, int(completed))
+                                         for podcast_id, (next_offset, total, completed) in progress.items()])
+            self.connection.executemany('INSERT OR REPLACE INTO latest_episodes VALUES (?, ?, ?)',
+                                        [(podcast_id, episode_id, release_date) for podcast_id, (episode_id, release_date)
+                                         in (latest_episodes or {}).items()])
+            self.connection.execute('INSERT OR REPLACE INTO csv_file VALUES (0, ?, ?)', (num_bytes, num_rows))
+
+class EpisodeWriter:
+    '''
+    Buffers episode data in preallocated columns and appends it to a csv file in chunks,
+    so memory stays bounded by the chunk size no matter how many episodes are crawled
     '''
-    # Initialize dataframe to store playlist track data
-    episode_df = pd.DataFrame(columns=column_names)
 
-    # Initialize query parameters
-    type = 'episodes'
-    market = 'US'
-    limit = 50
+    def __init__(self, path, column_names, chunk_size=10000, checkpoint=None):
+        '''
+        :param path: (string) csv file that episode data is appended to (overwritten if it exists,
+                      unless the checkpoint has a record of it)
+        :param column_names: (list of strings) column names for the csv file
+        :param chunk_size: (int) number of episodes held in memory before they're written to the csv file
+                            (pages with more episodes are written on their own)
+        :param checkpoint: (CrawlCheckpoint) if given, crawl progress is saved each time the csv file is written
+        '''
+        self.path = path
+        self.column_names = column_names
+        self.chunk_size = chunk_size
+        self.checkpoint = checkpoint
+
+        # Preallocate one buffer per column
+        self.buffers = {col: np.empty(chunk_size, dtype=object) for col in column_names}
+        self.num_buffered = 0
+        self.num_written = 0
+
+        # Podcast progress and latest episodes that will be saved to the checkpoint once the buffered episodes
+        # are written
+        self.pending_progress = {}
+        self.pending_latest = {}
+
+        # Lock so that several crawler threads can add episodes at the same time
+        self.lock = threading.Lock()
+
+        csv_file = checkpoint.get_csv_file() if checkpoint is not None else None
+        if csv_file is not None and os.path.exists(path):
+            # Resume the csv file, dropping anything written after the last checkpoint
+            num_bytes, self.num_written = csv_file
+            with open(path, 'r+b') as f:
+                f.truncate(num_bytes)
+        else:
+            # Start the csv file with just the header, and forget any progress that doesn't match it
+            pd.DataFrame(columns=column_names).to_csv(path)
+            if checkpoint is not None:
+                checkpoint.clear()
+
+    def add(self, ep_data):
+        '''
+        Add one episode to the buffers, writing the buffers to the csv file if they're full
+        :param ep_data: (list) episode data, in the same order as column_names
+        :return: None
+        '''
+        for col, value in zip(self.column_names, ep_data):
+            self.buffers[col][self.num_buffered] = value
+        self.num_buffered += 1
+
+        if self.num_buffered == self.chunk_size:
+            self.flush()
+
+    def add_page(self, podcast_id, podcast_title, items, next_offset=None, total=None, completed=False, latest=None):
+        '''
+        Add every episode in a page of Spotify API results
+        :param podcast_id: (string) podcast Spotify ID
+        :param podcast_title: (string) podcast title
+        :param items: (list of dictionaries) episodes returned by the Spotify API
+        :param next_offset: (int) offset of the podcast's next page
+        :param total: (int) total number of episodes for the podcast
+        :param completed: (bool) True if this is the podcast's last page
+        :param latest: (tuple) (episode ID, release date) of the podcast's newest episode, if it's known
+        :return: None
+        '''
+        with self.lock:
+            # Write the buffers first if the page won't fit, so a page is never split across two writes
+            # (otherwise a checkpoint could include part of a page without recording its progress)
+            if self.num_buffered + len(items) > self.chunk_size:
+                self.flush()
+            # A page bigger than the buffers (ex. all new episodes of a synced podcast) gets buffers of its own,
+            # so it's still written in one go
+            if len(items) > self.chunk_size:
+                self.buffers = {col: np.empty(len(items), dtype=object) for col in self.column_names}
+            for item in items:
+                # Save podcast ID, podcast title, episode ID, episode title, episode duration and episode release date
+                for col, value in zip(self.column_names, [podcast_id, podcast_title, item['id'], item['name'],
+                                                          item['duration_ms'], item['release_date']]):
+                    self.buffers[col][self.num_buffered] = value
+                self.num_buffered += 1
+            # Record progress before writing the buffers, so it's saved with the flush that writes the episodes
+            if latest is not None:
+                self.pending_latest[podcast_id] = latest
+            if next_offset is not None:
+                self.pending_progress[podcast_id] = (next_offset, total, completed)
+            if completed or self.num_buffered >= self.chunk_size:
+                self.flush()
+
+    def flush(self):
+        '''
+        Append all buffered episodes to the csv file, empty the buffers and save crawl progress
+        :return: None
+        '''
+        if self.num_buffered == 0 and not self.pending_progress and not self.pending_latest:
+            return
+
+        # Continue the row index from the rows already written, to match the index of a single to_csv call
+        chunk_df = pd.DataFrame({col: self.buffers[col][:self.num_buffered] for col in self.column_names},
+                                index=range(self.num_written, self.num_written + self.num_buffered))
+        with open(self.path, 'a', newline='') as f:
+            chunk_df.to_csv(f, header=False)
+            # Make sure the episodes are on disk before the checkpoint says they are
+            f.flush()
+            os.fsync(f.fileno())
+            num_bytes = f.tell()
+
+        self.num_written += self.num_buffered
+        self.num_buffered = 0
+        if len(self.buffers[self.column_names[0]]) != self.chunk_size:
+            # Go back to regular sized buffers after writing an oversized page
+            self.buffers = {col: np.empty(self.chunk_size, dtype=object) for col in self.column_names}
 
-    # Iterate through list of podcast IDs and get all episode data for each podcast
-    for i, podcast_id in enumerate(id_df['podcast_id'].tolist()):
-        if podcast_id == '':
-            # If the podcast has no podcast ID, skip
+        if self.checkpoint is not None:
+            self.checkpoint.save(self.pending_progress, num_bytes, self.num_written, self.pending_latest)
+        self.pending_progress = {}
+        self.pending_latest = {}
+
+class RateLimiter:
+    '''
+    Token bucket rate limiter shared by all crawler threads. The request rate is halved (and all requests are paused
+    for the Retry-After period) whenever the API responds with 429 Too Many Requests, then slowly recovers
+    '''
+
+    def __init__(self, rate=5.0, min_rate=0.5, max_rate=20.0, capacity=5, increase=0.05):
+        '''
+        :param rate: (float) starting number of requests per second
+        :param min_rate: (float) the rate is never cut below this number of requests per second
+        :param max_rate: (float) the rate is never raised above this number of requests per second
+        :param capacity: (int) max number of requests that can be sent in a burst
+        :param increase: (float) requests per second added to the rate after each successful request
+        '''
+        self.rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.capacity = capacity
+        self.increase = increase
+
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        '''
+        Block until a request can be sent
+        :return: None
+        '''
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                if now >= self.paused_until:
+                    # Refill the bucket for the time since the last update
+                    self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                    self.updated = now
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        return
+                    wait = (1 - self.tokens) / self.rate
+                else:
+                    wait = self.paused_until - now
+            time.sleep(wait)
+
+    def success(self):
+        '''
+        Record a successful request, raising the rate
+        :return: None
+        '''
+        with self.lock:
+            self.rate = min(self.max_rate, self.rate + self.increase)
+
+    def too_many_requests(self, retry_after):
+        '''
+        Record a 429 response, halving the rate and pausing all requests for retry_after seconds
+        :param retry_after: (float) seconds to wait, from the Retry-After header
+        :return: None
+        '''
+        with self.lock:
+            self.rate = max(self.min_rate, self.rate / 2)
+            self.paused_until = max(self.paused_until, time.monotonic() + retry_after)
+            # Empty the bucket so requests restart slowly once the pause is over
+            self.tokens = 0
+            self.updated = self.paused_until
+
+def get_page(session, limiter, url, params, max_retries=5):
+    '''
+    Send a get request, waiting for the rate limiter and retrying after 429s, server errors and connection errors
+    :param session: (requests Session) session with the Spotify authorization header
+    :param limiter: (RateLimiter) rate limiter shared by all requests
+    :param url: (string) endpoint url
+    :param params: (dictionary) query parameters
+    :param max_retries: (int) max number of retries
+    :return: (dictionary) json response
+    '''
+    for attempt in range(max_retries + 1):
+        limiter.acquire()
+        try:
+            query_response = session.get(url, params=params, timeout=30)
+        except requests.RequestException:
+            if attempt == max_retries:
+                raise
+            time.sleep(2 ** attempt)
+            continue
+
+        if query_response.status_code == 429 and attempt < max_retries:
+            # Wait for as long as the API asks (Retry-After is in seconds)
+            limiter.too_many_requests(float(query_response.headers.get('Retry-After', 1)))
             continue
+        if query_response.status_code >= 500 and attempt < max_retries:
+            time.sleep(2 ** attempt)
+            continue
+
+        if query_response.ok:
+            limiter.success()
+        return query_response.json()
+
+def get_podcast_episodes(session, limiter, page_pool, episode_writer, podcast_id, podcast_title, base_url,
+                         progress=None, market='US', limit=50):
+    '''
+    Get all episodes (on Spotify) for one podcast. The first page gives the total number of episodes,
+    then all remaining pages are requested in parallel
+    :param session: (requests Session) session with the Spotify authorization header
+    :param limiter: (RateLimiter) rate limiter shared by all requests
+    :param page_pool: (ThreadPoolExecutor) thread pool for page requests
+    :param episode_writer: (EpisodeWriter) writer that episode data is saved to
+    :param podcast_id: (string) podcast Spotify ID
+    :param podcast_title: (string) podcast title
+    :param base_url: (string) Spotify API base url
+    :param progress: (tuple) (next offset, total # of episodes, completed flag) from a previous crawl, if any
+    :param market: (string) Spotify market
+    :param limit: (int) number of episodes per page (max 50)
+    :return: (bool) True if all episodes were saved
+    '''
+    # Create url for podcast with podcast_id
+    endpoint_url = f"{base_url}/shows/{podcast_id}/episodes"
+
+    if progress is not None and progress[2]:
+        # Skip podcasts that were completed in a previous crawl
+        return True
+    elif progress is not None:
+        # Resume mid-pagination, using the total number of episodes recorded in the previous crawl
+        print('Resuming data for: '+podcast_title+', with ID: '+str(podcast_id)+' at offset '+str(progress[0]))
+        start_offset, total = progress[0], progress[1]
+    else:
+        print('Pulling data for: '+podcast_title+', with ID: '+str(podcast_id))
+
+        # Get the first page
+        response_json = get_page(session, limiter, endpoint_url,
+                                 {'type': 'episodes', 'offset': 0, 'market': market, 'limit': limit})
+        # Check that the json response is not an error
+        if 'error' in response_json:
+            print(response_json, ' for: ', podcast_title)
+            return False
+        start_offset, total = limit, response_json['total']
+        # Episodes are returned newest first, so the first episode is the podcast's latest
+        latest = (response_json['items'][0]['id'], response_json['items'][0]['release_date']) \
+            if response_json['items'] else None
+        episode_writer.add_page(podcast_id, podcast_title, response_json['items'], next_offset=start_offset,
+                                total=total, completed=start_offset >= total, latest=latest)
 
-        print('Pulling data for: '+id_df.loc[i, 'podcast_title']+', with ID: '+str(podcast_id))
-
-        # Initialize query counter
-        counter = 0
-        # Temporarily set total number of queries = 1 by default, so that the first query can be performed and used to
-        # calculate the actual total number of queries needed
-        total_num_queries = 1
-        # Set query to start by returning the first item
-        offset = 0
-
-        # Create url for podcast with podcast_id
-        endpoint_url = f"https://api.spotify.com/v1/shows/{podcast_id}/episodes?"
-
-        # Run a while loop and perform queries until all episodes on Spotify have been saved
-        while counter <= total_num_queries:
-            # Set up query
-            query = f'{endpoint_url}'
-            query += f'&type={type}'
-            query += f'&offset={offset}'
-            query += f'&market={market}'
-            query += f'&limit={limit}'
-
-            # Send a get request using Spotify API
-            query_response = requests.get(query,
-                                          headers={"Content-Type": "application/json", "Authorization": f"Bearer {token}"})
-            response_json = query_response.json()
-
-            # Check that the first entry in the json response is not an error
-            if next(iter(response_json)) != 'error':
-                # Iterate through items in the json response, and save data
-                for j in range(len(response_json['items'])):
-                    # Initialize dictionary for episode data
-                    ep_data = {}
-                    # Save podcast ID
-                    ep_data[column_names[0]] = podcast_id
-                    # Save podcast title
-                    ep_data[column_names[1]] = id_df.loc[i, 'podcast_title']
-                    # Save episode ID
-                    ep_data[column_names[2]] = response_json['items'][j]['id']
-                    # Save episode title
-                    ep_data[column_names[3]] = response_json['items'][j]['name']
-                    # Save episode duration
-                    ep_data[column_names[4]] = response_json['items'][j]['duration_ms']
-                    # Save episode release date
-                    ep_data[column_names[5]] = response_json['items'][j]['release_date']
-
-                    # Save episode data to dataframe
-                    episode_df.loc[episode_df.shape[0]] = ep_data
-
-                if counter == 0:
-                    # During the first query, calculate the total number of queries that need to be performed
-                    # and update the variable
-                    total_num_queries = math.floor(response_json['total'] // limit)
-
-                # Increment counter and offset after each query is performed
-                counter += 1
-                # Increase the offset by limit (num of items returned each time)
-                offset = offset + limit
-
-            else:
-                # If there's an error, print the error and break the loop
-                print(response_json, ' for: ', id_df.loc[i, 'podcast_title'])
+    # Use the total number of episodes to request all remaining pages in parallel
+    offsets = range(start_offset, total, limit)
+    futures = [page_pool.submit(get_page, session, limiter, endpoint_url,
+                                {'type': 'episodes', 'offset': offset, 'market': market, 'limit': limit})
+               for offset in offsets]
+
+    # Save pages in order, so the checkpoint only needs the next offset
+    for offset, future in zip(offsets, futures):
+        response_json = future.result()
+        if 'error' in response_json:
+            # If there's an error, print the error and skip the rest of the podcast
+            print(response_json, ' for: ', podcast_title)
+            for remaining in futures:
+                remaining.cancel()
+            return False
+        episode_writer.add_page(podcast_id, podcast_title, response_json['items'], next_offset=offset + limit,
+                                total=total, completed=offset + limit >= total)
+
+    return True
+
+def crawl_podcasts(token, id_df, crawl_podcast, max_podcasts=4, max_pages=8, base_url=SPOTIFY_API_URL, limiter=None):
+    '''
+    Run crawl_podcast for each podcast in id_df. Several podcasts are crawled at the same time,
+    sharing one session (and connection pool) and one rate limiter
+    :param token: (string) Spotify OAuth token
+    :param id_df: Pandas dataframe with podcast Spotify IDs
+    :param crawl_podcast: (function) takes (session, limiter, page_pool, podcast ID, podcast title) and crawls the podcast
+    :param max_podcasts: (int) max number of podcasts crawled at the same time
+    :param max_pages: (int) max number of page requests in flight at the same time
+    :param base_url: (string) Spotify API base url
+    :param limiter: (RateLimiter) rate limiter (None = create one with the default rate)
+    :return: None
+    '''
+    if limiter is None:
+        limiter = RateLimiter()
+
+    # Share one connection pool between all threads
+    session = requests.Session()
+    session.headers.update({"Content-Type": "application/json", "Authorization": f"Bearer {token}"})
+    session.mount(base_url, requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=max_pages + max_podcasts))
+
+    # Podcasts and pages use separate pools, so podcasts waiting on their pages can't block the page requests
+    with ThreadPoolExecutor(max_workers=max_podcasts) as podcast_pool, \
+            ThreadPoolExecutor(max_workers=max_pages) as page_pool:
+        futures = [podcast_pool.submit(crawl_podcast, session, limiter, page_pool, podcast_id, podcast_title)
+                   for podcast_id, podcast_title in zip(id_df['podcast_id'], id_df['podcast_title'])
+                   # If the podcast has no podcast ID, skip
+                   if podcast_id != '']
+        for future in futures:
+            future.result()
+
+def get_all_episode_data(token, column_names, id_df, output_path, chunk_size=10000, max_podcasts=4, max_pages=8,
+                         base_url=SPOTIFY_API_URL, limiter=None, checkpoint_path=None):
+    '''
+    Get all episodes (on Spotify) for each podcast in df and save them to a csv file.
+    Several podcasts are crawled at the same time, behind one shared rate limiter.
+    If a checkpoint is used, a restarted crawl skips completed podcasts and resumes the others where they stopped
+    :param id_df: Pandas dataframe with podcast Spotify IDs
+    :param output_path: (string) csv file that episode data is saved to
+    :param chunk_size: (int) number of episodes held in memory before they're written to the csv file
+    :param max_podcasts: (int) max number of podcasts crawled at the same time
+    :param max_pages: (int) max number of page requests in flight at the same time
+    :param base_url: (string) Spotify API base url
+    :param limiter: (RateLimiter) rate limiter (None = create one with the default rate)
+    :param checkpoint_path: (string) SQLite database used to checkpoint crawl progress (None = no checkpoint)
+    :return: num_episodes: (int) number of episodes saved (including episodes saved before a restart)
+    '''
+    # Initialize writer to store episode data
+    checkpoint = CrawlCheckpoint(checkpoint_path) if checkpoint_path is not None else None
+    episode_writer = EpisodeWriter(output_path, column_names, chunk_size, checkpoint)
+
+    # Load progress from previous crawls
+    progress = checkpoint.get_progress() if checkpoint is not None else {}
+
+    def crawl_podcast(session, limiter, page_pool, podcast_id, podcast_title):
+        return get_podcast_episodes(session, limiter, page_pool, episode_writer, podcast_id, podcast_title, base_url,
+                                    progress.get(podcast_id))
+
+    crawl_podcasts(token, id_df, crawl_podcast, max_podcasts, max_pages, base_url, limiter)
+
+    # Write any remaining episodes to the csv file
+    episode_writer.flush()
+
+    return episode_writer.num_written
+
+def release_date_range(release_date, precision=None):
+    '''
+    Get the first and last day an episode could have been released on. Spotify only gives the year or month of some
+    episodes' release dates (ex. '2019' or '2019-03'), so these can't be compared with full dates as strings
+    :param release_date: (string) release date ('YYYY', 'YYYY-MM' or 'YYYY-MM-DD')
+    :param precision: (string) release date precision ('year', 'month' or 'day'; None = taken from the date's format)
+    :return: first_day, last_day: (pandas Timestamps) NaT if the release date can't be read
+    '''
+    if precision is None:
+        precision = {4: 'year', 7: 'month'}.get(len(release_date), 'day')
+    first_day = pd.to_datetime(release_date, errors='coerce')
+    if precision == 'year':
+        return first_day, first_day + pd.offsets.YearEnd(0)
+    elif precision == 'month':
+        return first_day, first_day + pd.offsets.MonthEnd(0)
+    return first_day, first_day
+
+def sync_podcast_episodes(session, limiter, episode_writer, podcast_id, podcast_title, base_url, latest,
+                          market='US', limit=50):
+    '''
+    Get the episodes (on Spotify) released since the podcast's latest saved episode. Pages are walked newest first,
+    and the walk stops as soon as it reaches an episode that has already been saved
+    :param session: (requests Session) session with the Spotify authorization header
+    :param limiter: (RateLimiter) rate limiter shared by all requests
+    :param episode_writer: (EpisodeWriter) writer that episode data is saved to
+    :param podcast_id: (string) podcast Spotify ID
+    :param podcast_title: (string) podcast title
+    :param base_url: (string) Spotify API base url
+    :param latest: (tuple) (episode ID, release date) of the podcast's latest saved episode
+                   ((None, '') = no saved episodes, so every episode is pulled)
+    :param market: (string) Spotify market
+    :param limit: (int) number of episodes per page (max 50)
+    :return: (bool) True if all new episodes were saved
+    '''
+    # Create url for podcast with podcast_id
+    endpoint_url = f"{base_url}/shows/{podcast_id}/episodes"
+    latest_id, latest_date = latest
+    latest_first_day = release_date_range(latest_date)[0] if latest_date else pd.NaT
+
+    # Walk pages until an episode that has already been saved is reached
+    new_items = []
+    offset = 0
+    reached_saved = False
+    while not reached_saved and (offset == 0 or offset < response_json['total']):
+        response_json = get_page(session, limiter, endpoint_url,
+                                 {'type': 'episodes', 'offset': offset, 'market': market, 'limit': limit})
+        if 'error' in response_json:
+            print(response_json, ' for: ', podcast_title)
+            return False
+
+        for item in response_json['items']:
+            # Stop at the latest saved episode, or at anything that was certainly released before it
+            item_last_day = release_date_range(item['release_date'], item.get('release_date_precision'))[1]
+            if item['id'] == latest_id or item_last_day < latest_first_day:
+                reached_saved = True
                 break
+            new_items.append(item)
+        offset = offset + limit
+
+    print('Pulled ' + str(len(new_items)) + ' new episodes for: ' + podcast_title)
+
+    # Save all new episodes at once, together with the podcast's new latest episode, so that an interrupted sync
+    # never records a latest episode without also saving the episodes before it
+    if new_items:
+        episode_writer.add_page(podcast_id, podcast_title, new_items,
+                                latest=(new_items[0]['id'], new_items[0]['release_date']))
+
+    return True
+
+def bootstrap_checkpoint(checkpoint, output_path, chunk_size=100000):
+    '''
+    Record the size of an existing episode csv file (ex. one saved without a checkpoint) and the latest episode of
+    each podcast in it, so that it can be synced incrementally
+    :param checkpoint: (CrawlCheckpoint) checkpoint to record the csv file in
+    :param output_path: (string) episode csv file
+    :param chunk_size: (int) number of rows read at a time
+    :return: None
+    '''
+    latest_episodes = {}
+    num_rows = 0
+    for chunk_df in pd.read_csv(output_path, usecols=['podcast_id', 'episode_id', 'release_date'], dtype=str,
+                                keep_default_na=False, chunksize=chunk_size):
+        num_rows += chunk_df.shape[0]
+        # Get each podcast's newest episode in the chunk (ties go to the episode listed first, i.e. the newest)
+        chunk_latest = chunk_df.sort_values('release_date', ascending=False, kind='stable')\
+                               .drop_duplicates('podcast_id')
+        for podcast_id, episode_id, release_date in chunk_latest[['podcast_id', 'episode_id', 'release_date']]\
+                .itertuples(index=False):
+            if podcast_id not in latest_episodes or release_date > latest_episodes[podcast_id][1]:
+                latest_episodes[podcast_id] = (episode_id, release_date)
+
+    checkpoint.save({}, os.path.getsize(output_path), num_rows, latest_episodes)
+
+def sync_all_episode_data(token, column_names, id_df, output_path, checkpoint_path, chunk_size=10000,
+                          max_podcasts=4, max_pages=8, base_url=SPOTIFY_API_URL, limiter=None):
+    '''
+    Append episodes (on Spotify) released since the last run to the episode csv file.
+    Podcasts with a latest saved episode only need one or two requests; podcasts that have never been
+    (fully) crawled are crawled in full
+    :param id_df: Pandas dataframe with podcast Spotify IDs
+    :param output_path: (string) csv file that episode data is appended to
+    :param checkpoint_path: (string) SQLite database with the latest saved episode of each podcast
+    :param chunk_size: (int) number of episodes held in memory before they're written to the csv file
+    :param max_podcasts: (int) max number of podcasts synced at the same time
+    :param max_pages: (int) max number of page requests in flight at the same time (for full crawls)
+    :param base_url: (string) Spotify API base url
+    :param limiter: (RateLimiter) rate limiter (None = create one with the default rate)
+    :return: num_episodes: (int) number of new episodes saved
+    '''
+    # Record an existing csv file that was saved without a checkpoint
+    checkpoint = CrawlCheckpoint(checkpoint_path)
+    if checkpoint.get_csv_file() is None and os.path.exists(output_path):
+        bootstrap_checkpoint(checkpoint, output_path)
+
+    # Initialize writer to append episode data
+    episode_writer = EpisodeWriter(output_path, column_names, chunk_size, checkpoint)
+    num_saved = episode_writer.num_written
+
+    # Load the latest saved episode of each podcast, and progress from previous crawls
+    latest_episodes = checkpoint.get_latest_episodes()
+    progress = checkpoint.get_progress()
+
+    def sync_podcast(session, limiter, page_pool, podcast_id, podcast_title):
+        # Podcasts saved in a csv file without a checkpoint have a latest episode but no progress, and count as complete
+        completed = progress.get(podcast_id, (0, 0, podcast_id in latest_episodes))[2]
+        if completed:
+            # Only sync podcasts that have been fully crawled (a podcast that had no episodes is synced from the start)
+            return sync_podcast_episodes(session, limiter, episode_writer, podcast_id, podcast_title, base_url,
+                                         latest_episodes.get(podcast_id, (None, '')))
+        # Otherwise crawl (or resume crawling) the podcast
+        return get_podcast_episodes(session, limiter, page_pool, episode_writer, podcast_id, podcast_title, base_url,
+                                    progress.get(podcast_id))
+
+    crawl_podcasts(token, id_df, sync_podcast, max_podcasts, max_pages, base_url, limiter)
 
-        # Wait 1 min after querying each podcast
-        time.sleep(60)
+    # Write any remaining episodes to the csv file
+    episode_writer.flush()
 
-    return episode_df
+    return episode_writer.num_written - num_saved
 
 if __name__ == "__main__":
     OAuthToken = 'XXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXX'
@@ -101,8 +576,15 @@ if __name__ == "__main__":
     # Set column names
     column_names = ['podcast_id', 'podcast_title', 'episode_id', 'episode_title', 'duration_ms', 'release_date']
 
-    # Get episode data
-    episode_df = get_all_episode_data(OAuthToken, column_names, id_df)
+    # Set to True to only pull episodes released since the last run, instead of every podcast's full back catalog
+    incremental = False
 
-    # Save data
-    episode_df.to_csv('data/spotify_podcast_ep_data.csv')
\ No newline at end of file
+    if incremental:
+        # Append new episode data to the saved data
+        sync_all_episode_data(OAuthToken, column_names, id_df, 'data/spotify_podcast_ep_data.csv',
+                              checkpoint_path='data/spotify_podcast_ep_data_checkpoint.db')
+    else:
+        # Get episode data and save it (if the crawl is interrupted, re-running resumes from the checkpoint;
+        # delete the checkpoint file to start over)
+        get_all_episode_data(OAuthToken, column_names, id_df, 'data/spotify_podcast_ep_data.csv',
+                             checkpoint_path='data/spotify_podcast_ep_data_checkpoint.db')
\ No newline at end of file
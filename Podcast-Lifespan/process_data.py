@@ -1,149 +1,98 @@
 import pandas as pd
 import numpy as np
+import os
 from datetime import datetime as dt
 
-def get_release_period(id_df, ep_df):
+def load_release_overrides(path='release_period_overrides.csv'):
+    '''
+    Loads the manual fixes to podcast release periods
+    :param path: (string) csv file with one row per podcast: podcast_title, first_ep_release_date,
+                  last_ep_release_date and exclude (1 = remove the podcast from the analysis)
+    :return: override_df: Pandas dataframe with dates parsed as datetimes
+    '''
+    override_df = pd.read_csv(path, parse_dates=['first_ep_release_date', 'last_ep_release_date'],
+                              dtype={'podcast_title': str, 'exclude': int})
+    return override_df
+
+def aggregate_release_dates(ep_paths, chunk_size=1000000):
+    '''
+    Returns the release dates of the first and last episodes of each podcast, reading the episode data in chunks,
+    so memory is proportional to the number of podcasts rather than the number of episodes
+    :param ep_paths: (string or list of strings) episode csv file, or list of csv files (ex. one file per partition)
+    :param chunk_size: (int) number of episodes read at a time
+    :return: ep_release_df: Pandas dataframe with podcast_id, first_ep_release_date and last_ep_release_date
+    '''
+    if isinstance(ep_paths, str):
+        ep_paths = [ep_paths]
+
+    # Running min/max release date (as int64 nanoseconds) per podcast, stored in arrays indexed by podcast code
+    podcast_codes = {}
+    capacity = 1024
+    first_dates = np.full(capacity, np.iinfo(np.int64).max)
+    last_dates = np.full(capacity, np.iinfo(np.int64).min)
+
+    for ep_path in ep_paths:
+        for chunk_df in pd.read_csv(ep_path, usecols=['podcast_id', 'release_date'], dtype={'podcast_id': str},
+                                    chunksize=chunk_size):
+            # Convert dates to datetime and get each podcast's first and last release dates in the chunk
+            chunk_df['release_date'] = pd.to_datetime(chunk_df['release_date'])
+            chunk_df = chunk_df.dropna(subset=['release_date'])
+            chunk_release_df = chunk_df.groupby('podcast_id')['release_date'].agg(['min', 'max'])
+
+            # Give each new podcast the next code, growing the arrays if they're full
+            codes = np.array([podcast_codes.setdefault(podcast_id, len(podcast_codes))
+                              for podcast_id in chunk_release_df.index], dtype=np.int64)
+            if len(podcast_codes) > capacity:
+                new_capacity = max(2 * capacity, len(podcast_codes))
+                first_dates = np.concatenate([first_dates, np.full(new_capacity - capacity, np.iinfo(np.int64).max)])
+                last_dates = np.concatenate([last_dates, np.full(new_capacity - capacity, np.iinfo(np.int64).min)])
+                capacity = new_capacity
+
+            # Update the running min/max
+            first_dates[codes] = np.minimum(first_dates[codes],
+                                            chunk_release_df['min'].to_numpy(dtype='datetime64[ns]').view(np.int64))
+            last_dates[codes] = np.maximum(last_dates[codes],
+                                           chunk_release_df['max'].to_numpy(dtype='datetime64[ns]').view(np.int64))
+
+    # Convert the arrays back to datetimes
+    num_podcasts = len(podcast_codes)
+    ep_release_df = pd.DataFrame({'podcast_id': list(podcast_codes),
+                                  'first_ep_release_date': first_dates[:num_podcasts].view('datetime64[ns]'),
+                                  'last_ep_release_date': last_dates[:num_podcasts].view('datetime64[ns]')})
+    ep_release_df = ep_release_df.sort_values('podcast_id').reset_index(drop=True)
+
+    return ep_release_df
+
+def get_release_period(id_df, ep_release_df, override_df):
     '''
     Returns pandas dataframe with the length of the original release period of each podcast in id_df
     :param id_df: (Pandas dataframe) Contains the top 50 podcasts in the US in 2021
-    :param ep_df: (Pandas dataframe) Contains Spotify data for every episode of each podcast in id_df
+    :param ep_release_df: (Pandas dataframe) Contains the release dates of the first and last episodes of each podcast
+                           in id_df, according to Spotify (see aggregate_release_dates)
+    :param override_df: (Pandas dataframe) Contains manual release periods and exclusions (see load_release_overrides)
     :return: podcast_release_df: Pandas dataframe
     '''
-    # Copy id_df and ep_df to avoid errors
+    # Copy id_df to avoid errors
     podcast_release_df = id_df.copy()
-    ep_df = ep_df.copy()
 
     # Remove unnecessary columns
     podcast_release_df = podcast_release_df.drop(columns=['publisher (Edison)','publisher'])
-    ep_df = ep_df.drop(columns=['duration_ms'])
-
-    # Convert dates to datetime
-    ep_df['release_date'] = pd.to_datetime(ep_df['release_date'])
-
-    # Get the release dates of the first and last episodes of each podcast, according to Spotify
-    ep_release_df = ep_df.groupby('podcast_id')['release_date'].agg(first_ep_release_date='min', last_ep_release_date='max')
-    ep_release_df = ep_release_df.reset_index()
 
     # Merge ep_release_df with podcast_release_df to get podcast titles and other data
     podcast_release_df = podcast_release_df.merge(ep_release_df, left_on='podcast_id', right_on='podcast_id', how='left')
 
-    # Manually add release periods for podcasts where all episodes are not available on Spotify
-    podcast_release_df.loc[podcast_release_df['podcast_title'] == 'Dr. Death', 'first_ep_release_date'] \
-        = pd.to_datetime('2018-09-04')
-    podcast_release_df.loc[podcast_release_df['podcast_title'] == 'Dr. Death', 'last_ep_release_date'] \
-        = pd.to_datetime('2021-09-21')
-
-    podcast_release_df.loc[podcast_release_df['podcast_title'] == 'This American Life', 'first_ep_release_date'] \
-        = pd.to_datetime('1995-11-17')
-    podcast_release_df.loc[podcast_release_df['podcast_title'] == 'This American Life', 'last_ep_release_date'] \
-        = pd.to_datetime('2021-08-03')
-
-    podcast_release_df.loc[podcast_release_df['podcast_title'] == 'Pod Save America', 'first_ep_release_date'] \
-        = pd.to_datetime('2017-01-01')
-    podcast_release_df.loc[podcast_release_df['podcast_title'] == 'Pod Save America', 'last_ep_release_date'] \
-        = pd.to_datetime('2022-03-31')
-
-    podcast_release_df.loc[podcast_release_df['podcast_title'] == 'The Ben Shapiro Show', 'first_ep_release_date'] \
-        = pd.to_datetime('2015-09-01')
-    podcast_release_df.loc[podcast_release_df['podcast_title'] == 'The Ben Shapiro Show', 'last_ep_release_date'] \
-        = pd.to_datetime('2022-04-01')
-
-    podcast_release_df.loc[podcast_release_df['podcast_title'] == 'Wait Wait… Don’t Tell Me!', 'first_ep_release_date'] \
-        = pd.to_datetime('1998-01-03')
-    podcast_release_df.loc[podcast_release_df['podcast_title'] == 'Wait Wait… Don’t Tell Me!', 'last_ep_release_date'] \
-        = pd.to_datetime('2022-04-01')
-
-    podcast_release_df.loc[podcast_release_df['podcast_title'] == 'Planet Money', 'first_ep_release_date'] \
-        = pd.to_datetime('2008-09-06')
-    podcast_release_df.loc[podcast_release_df['podcast_title'] == 'Planet Money', 'last_ep_release_date'] \
-        = pd.to_datetime('2022-03-30')
-
-    podcast_release_df.loc[podcast_release_df['podcast_title'] == 'Fresh Air', 'first_ep_release_date'] \
-        = pd.to_datetime('1985-01-01')
-    podcast_release_df.loc[podcast_release_df['podcast_title'] == 'Fresh Air', 'last_ep_release_date'] \
-        = pd.to_datetime('2022-04-01')
-
-    podcast_release_df.loc[podcast_release_df['podcast_title'] == 'Up First', 'first_ep_release_date'] \
-        = pd.to_datetime('2017-04-05')
-    podcast_release_df.loc[podcast_release_df['podcast_title'] == 'Up First', 'last_ep_release_date'] \
-        = pd.to_datetime('2022-04-01')
-
-    podcast_release_df.loc[podcast_release_df['podcast_title'] == 'The Dan Bongino Show', 'first_ep_release_date'] \
-        = pd.to_datetime('2017-01-01')
-    podcast_release_df.loc[podcast_release_df['podcast_title'] == 'The Dan Bongino Show', 'last_ep_release_date'] \
-        = pd.to_datetime('2022-04-01')
-
-    podcast_release_df.loc[podcast_release_df['podcast_title'] == 'Radiolab', 'first_ep_release_date'] \
-        = pd.to_datetime('2002-01-01')
-    podcast_release_df.loc[podcast_release_df['podcast_title'] == 'Radiolab', 'last_ep_release_date'] \
-        = pd.to_datetime('2022-04-01')
-
-    podcast_release_df.loc[podcast_release_df['podcast_title'] == 'TED Talks Daily', 'first_ep_release_date'] \
-        = pd.to_datetime('2014-05-23')
-    podcast_release_df.loc[podcast_release_df['podcast_title'] == 'TED Talks Daily', 'last_ep_release_date'] \
-        = pd.to_datetime('2022-04-01')
-
-    podcast_release_df.loc[podcast_release_df['podcast_title'] == 'The Dave Ramsey Show', 'first_ep_release_date'] \
-        = pd.to_datetime('1992-06-15')
-    podcast_release_df.loc[podcast_release_df['podcast_title'] == 'The Dave Ramsey Show', 'last_ep_release_date'] \
-        = pd.to_datetime('2022-03-31')
-
-    podcast_release_df.loc[podcast_release_df['podcast_title'] == 'WTF with Marc Maron Podcast', 'first_ep_release_date'] \
-        = pd.to_datetime('2009-09-01')
-    podcast_release_df.loc[podcast_release_df['podcast_title'] == 'WTF with Marc Maron Podcast', 'last_ep_release_date'] \
-        = pd.to_datetime('2022-03-31')
-
-    podcast_release_df.loc[podcast_release_df['podcast_title'] == 'The Rachel Maddow Show', 'first_ep_release_date'] \
-        = pd.to_datetime('2008-09-08')
-    podcast_release_df.loc[podcast_release_df['podcast_title'] == 'The Rachel Maddow Show', 'last_ep_release_date'] \
-        = pd.to_datetime('2022-04-01')
-
-    podcast_release_df.loc[podcast_release_df['podcast_title'] == 'The Breakfast Club', 'first_ep_release_date'] \
-        = pd.to_datetime('2010-12-01')
-    podcast_release_df.loc[podcast_release_df['podcast_title'] == 'The Breakfast Club', 'last_ep_release_date'] \
-        = pd.to_datetime('2021-06-07')
-
-    podcast_release_df.loc[podcast_release_df['podcast_title'] == 'Frenemies Podcast', 'first_ep_release_date'] \
-        = pd.to_datetime('2020-09-15')
-    podcast_release_df.loc[podcast_release_df['podcast_title'] == 'Frenemies Podcast', 'last_ep_release_date'] \
-        = pd.to_datetime('2021-06-07')
-
-    podcast_release_df.loc[podcast_release_df['podcast_title'] == 'The Joe Budden Podcast', 'first_ep_release_date'] \
-        = pd.to_datetime('2015-02-18')
-    podcast_release_df.loc[podcast_release_df['podcast_title'] == 'The Joe Budden Podcast', 'last_ep_release_date'] \
-        = pd.to_datetime('2022-03-30')
-
-    podcast_release_df.loc[podcast_release_df['podcast_title'] == 'The Best of Car Talk', 'first_ep_release_date'] \
-        = pd.to_datetime('1977-01-01')
-    podcast_release_df.loc[podcast_release_df['podcast_title'] == 'The Best of Car Talk', 'last_ep_release_date'] \
-        = pd.to_datetime('2012-10-01')
-
-    podcast_release_df.loc[podcast_release_df['podcast_title'] == 'The Moth', 'first_ep_release_date'] \
-        = pd.to_datetime('2009-08-01')
-    podcast_release_df.loc[podcast_release_df['podcast_title'] == 'The Moth', 'last_ep_release_date'] \
-        = pd.to_datetime('2022-03-28')
-
-    podcast_release_df.loc[podcast_release_df['podcast_title'] == 'Bill Burr’s Monday Morning Podcast', 'first_ep_release_date'] \
-        = pd.to_datetime('2007-05-01')
-    podcast_release_df.loc[podcast_release_df['podcast_title'] == 'Bill Burr’s Monday Morning Podcast', 'last_ep_release_date'] \
-        = pd.to_datetime('2022-03-31')
-
-    podcast_release_df.loc[
-        podcast_release_df['podcast_title'] == 'Last Podcast On The Left', 'first_ep_release_date'] \
-        = pd.to_datetime('2011-03-29')
-    podcast_release_df.loc[
-        podcast_release_df['podcast_title'] == 'Last Podcast On The Left', 'last_ep_release_date'] \
-        = pd.to_datetime('2022-04-01')
-
-    podcast_release_df.loc[
-        podcast_release_df['podcast_title'] == 'Pardon My Take', 'first_ep_release_date'] \
-        = pd.to_datetime('2016-02-29')
-    podcast_release_df.loc[
-        podcast_release_df['podcast_title'] == 'Pardon My Take', 'last_ep_release_date'] \
-        = pd.to_datetime('2022-04-01')
-
-    # Remove "NPR News Now" because data on the original release period is unavailable
-    podcast_release_df = podcast_release_df[podcast_release_df['podcast_title'] != 'NPR News Now']
+    # Manually set release periods for podcasts where all episodes are not available on Spotify,
+    # using one merge on podcast title (manual dates take precedence over Spotify dates)
+    date_cols = ['first_ep_release_date', 'last_ep_release_date']
+    podcast_release_df = podcast_release_df.merge(override_df, on='podcast_title', how='left', suffixes=('', '_override'))
+    for col in date_cols:
+        podcast_release_df[col] = podcast_release_df[col + '_override'].combine_first(podcast_release_df[col])
+    podcast_release_df = podcast_release_df.drop(columns=[col + '_override' for col in date_cols])
+
+    # Remove podcasts flagged for exclusion (ex. "NPR News Now", because data on the original release period
+    # is unavailable)
+    podcast_release_df = podcast_release_df[podcast_release_df['exclude'] != 1]
+    podcast_release_df = podcast_release_df.drop(columns=['exclude'])
     podcast_release_df = podcast_release_df.reset_index(drop=True)
 
     # Calculate the length of each podcast's original release period in years
@@ -152,6 +101,51 @@ def get_release_period(id_df, ep_df):
 
     return podcast_release_df
 
+def get_release_cadence(ep_df):
+    '''
+    Returns pandas dataframe with the release cadence of each podcast: the median gap between episodes,
+    the longest hiatus and the share of weeks (between the first and last episodes) with at least one release
+    :param ep_df: (Pandas dataframe) Contains podcast_id and release_date for every episode
+    :return: cadence_df: Pandas dataframe with one row per podcast
+    '''
+    # Drop episodes with no release date (NaT would become the smallest int64 day number)
+    release_dates = pd.to_datetime(ep_df['release_date'])
+    has_date = release_dates.notna().to_numpy()
+
+    # Convert podcast IDs to integer codes and release dates to day numbers
+    podcast_codes, podcast_ids = pd.factorize(ep_df['podcast_id'][has_date])
+    days = release_dates[has_date].to_numpy(dtype='datetime64[D]').astype(np.int64)
+
+    # Sort episodes once by (podcast, release date)
+    order = np.lexsort((days, podcast_codes))
+    podcast_codes = podcast_codes[order]
+    days = days[order]
+
+    # Calculate the gap (in days) since each podcast's previous episode (NaN for each podcast's first episode)
+    same_podcast = np.concatenate([[False], podcast_codes[1:] == podcast_codes[:-1]])
+    gaps = np.where(same_podcast, np.diff(days, prepend=days[:1]), np.nan)
+
+    # Number weeks starting on Mondays (day 0 is a Thursday) and flag each podcast's first episode in each week
+    weeks = (days + 3) // 7
+    new_week = ~same_podcast | (weeks != np.concatenate([weeks[:1], weeks[:-1]]))
+
+    # Reduce to per-podcast stats in one grouped pass
+    cadence_df = pd.DataFrame({'podcast_code': podcast_codes, 'gap': gaps, 'new_week': new_week, 'week': weeks})\
+        .groupby('podcast_code', sort=True)\
+        .agg(num_episodes=('week', 'size'), median_gap_days=('gap', 'median'), longest_hiatus_days=('gap', 'max'),
+             release_weeks=('new_week', 'sum'), first_week=('week', 'min'), last_week=('week', 'max'))
+
+    # Calculate the share of weeks with a release
+    cadence_df['weekly_release_share'] = \
+        cadence_df['release_weeks'] / (cadence_df['last_week'] - cadence_df['first_week'] + 1)
+    cadence_df = cadence_df.drop(columns=['release_weeks', 'first_week', 'last_week'])
+
+    # Replace codes with podcast IDs
+    cadence_df.insert(0, 'podcast_id', podcast_ids[cadence_df.index])
+    cadence_df = cadence_df.reset_index(drop=True)
+
+    return cadence_df
+
 def process_publisher_data(id_df):
     '''
     Returns pandas dataframe with the share of the top 50 podcasts attributed to each publisher
@@ -186,10 +180,126 @@ def process_publisher_data(id_df):
 
     return key_pub_df
 
+def count_publisher_podcasts(chart_df):
+    '''
+    Returns pandas dataframe with the number of podcasts each publisher has on each quarterly chart
+    :param chart_df: (Pandas dataframe) Contains one row per podcast per quarterly chart, with columns
+                      quarter (ex. '2021Q1'), podcast_title and publisher
+    :return: counts_df: Pandas dataframe with quarter, publisher and podcast_count
+    '''
+    chart_df = chart_df.copy()
+    chart_df['quarter'] = pd.PeriodIndex(chart_df['quarter'].astype(str), freq='Q')
+
+    # Count podcasts per (quarter, publisher) in one grouped pass
+    counts_df = chart_df.groupby(['quarter', 'publisher'])['podcast_title'].agg(podcast_count='count').reset_index()
+
+    return counts_df
+
+def get_rolling_publisher_shares(counts_df, window_ends=None, window=4, k=5):
+    '''
+    Returns each publisher's share of the podcasts on the charts in a rolling window of quarters, its rank and rank
+    change, and whether it's a key publisher (top k in the window, ties included), plus churn stats for each window
+    :param counts_df: (Pandas dataframe) output of count_publisher_podcasts
+    :param window_ends: (list of pandas Periods) last quarter of each window to calculate (None = every quarter).
+                         Only the quarters these windows (and the windows before them) cover are used
+    :param window: (int) number of quarters in each window
+    :param k: (int) number of key publishers per window
+    :return: shares_df: Pandas dataframe with one row per window and publisher on the charts in that window
+    :return: churn_df: Pandas dataframe with one row per window: share turnover (half the sum of absolute share changes
+                       vs the previous window, in %), and the number of publishers entering and leaving the top k
+    '''
+    if window_ends is None:
+        window_ends = counts_df['quarter'].unique()
+    window_ends = pd.PeriodIndex(window_ends, freq='Q').sort_values()
+
+    # Only use quarters covered by the requested windows and the window before each of them
+    quarters = pd.period_range(window_ends.min() - window, window_ends.max(), freq='Q')
+    counts_df = counts_df[counts_df['quarter'].isin(quarters)]
+
+    # Build a (quarter x publisher) matrix of podcast counts, with zeros for missing quarters and publishers
+    wide_df = counts_df.pivot_table(index='quarter', columns='publisher', values='podcast_count',
+                                    aggfunc='sum', fill_value=0)
+    wide_df = wide_df.reindex(quarters, fill_value=0)
+
+    # Calculate rolling counts, shares and ranks for every window at once
+    rolling_df = wide_df.rolling(window, min_periods=1).sum()
+    share_df = rolling_df.div(rolling_df.sum(axis=1), axis=0) * 100
+    rank_df = rolling_df.where(rolling_df > 0).rank(axis=1, ascending=False, method='min')
+    rank_change_df = rank_df.shift(1) - rank_df
+    key_df = rank_df <= k
+
+    # Calculate churn stats between each window and the previous window
+    churn_df = pd.DataFrame({'share_turnover': share_df.diff().abs().sum(axis=1) / 2,
+                             'key_publishers_in': (key_df & ~key_df.shift(1, fill_value=False)).sum(axis=1),
+                             'key_publishers_out': (~key_df & key_df.shift(1, fill_value=False)).sum(axis=1)})
+    churn_df = churn_df.loc[window_ends].rename_axis('quarter').reset_index()
+
+    # Reshape to one row per window and publisher, keeping publishers on the charts in each window
+    metrics = {'podcast_count': rolling_df, 'percentage': share_df, 'rank': rank_df,
+               'rank_change': rank_change_df, 'key_publisher': key_df}
+    shares_df = pd.concat([metric_df.loc[window_ends].rename_axis(index='quarter', columns='publisher').reset_index()
+                           .melt(id_vars='quarter', value_name=name).set_index(['quarter', 'publisher'])
+                           for name, metric_df in metrics.items()], axis=1)
+    shares_df = shares_df[shares_df['podcast_count'] > 0].reset_index()
+    shares_df = shares_df.sort_values(['quarter', 'rank', 'publisher']).reset_index(drop=True)
+
+    return shares_df, churn_df
+
+def update_publisher_shares(counts_df, shares_df, churn_df, new_chart_df, window=4, k=5):
+    '''
+    Adds new quarterly charts to previously calculated publisher shares, recalculating only the windows that
+    include the new quarters (or whose previous window does)
+    :param counts_df: (Pandas dataframe) previous output of count_publisher_podcasts
+    :param shares_df: (Pandas dataframe) previous shares_df output of get_rolling_publisher_shares
+    :param churn_df: (Pandas dataframe) previous churn_df output of get_rolling_publisher_shares
+    :param new_chart_df: (Pandas dataframe) new quarterly charts (same columns as in count_publisher_podcasts)
+    :param window: (int) number of quarters in each window
+    :param k: (int) number of key publishers per window
+    :return: counts_df, shares_df, churn_df: updated dataframes
+    '''
+    # Count podcasts for the new quarters, replacing any previous counts for those quarters
+    new_counts_df = count_publisher_podcasts(new_chart_df)
+    new_quarters = new_counts_df['quarter'].unique()
+    counts_df = pd.concat([counts_df[~counts_df['quarter'].isin(new_quarters)], new_counts_df], ignore_index=True)
+    counts_df = counts_df.sort_values(['quarter', 'publisher']).reset_index(drop=True)
+
+    # Find windows affected by the new quarters
+    all_quarters = pd.PeriodIndex(counts_df['quarter'].unique(), freq='Q')
+    affected = all_quarters[(all_quarters >= new_quarters.min()) & (all_quarters <= new_quarters.max() + window)]
+
+    # Recalculate the affected windows and replace them
+    new_shares_df, new_churn_df = get_rolling_publisher_shares(counts_df, affected, window, k)
+    shares_df = pd.concat([shares_df[~shares_df['quarter'].isin(affected)], new_shares_df], ignore_index=True)
+    shares_df = shares_df.sort_values(['quarter', 'rank', 'publisher']).reset_index(drop=True)
+    churn_df = pd.concat([churn_df[~churn_df['quarter'].isin(affected)], new_churn_df], ignore_index=True)
+    churn_df = churn_df.sort_values('quarter').reset_index(drop=True)
+
+    return counts_df, shares_df, churn_df
+
+def get_key_publisher_data(shares_df, quarter):
+    '''
+    Returns the key publishers' share of the podcasts on the charts in the window ending in quarter, with all other
+    publishers aggregated into "Other" (same layout as process_publisher_data, for the pie chart)
+    :param shares_df: (Pandas dataframe) shares_df output of get_rolling_publisher_shares
+    :param quarter: (string or pandas Period) last quarter of the window
+    :return: key_pub_df: Pandas dataframe
+    '''
+    window_df = shares_df[shares_df['quarter'] == pd.Period(quarter, freq='Q')]
+
+    # Reorder key publishers in descending order
+    key_pub_df = window_df.loc[window_df['key_publisher'], ['publisher', 'podcast_count', 'percentage']]
+    key_pub_df = key_pub_df.sort_values(['percentage'], ascending=[False])
+
+    # Aggregate "non-key publishers" data into one entry called "Other"
+    other_df = window_df.loc[~window_df['key_publisher'], ['podcast_count', 'percentage']].sum()
+    key_pub_df = pd.concat([key_pub_df, pd.DataFrame([{'publisher': 'Other', **other_df}])], ignore_index=True)
+
+    return key_pub_df
+
 if __name__ == "__main__":
     # Load data
-    ep_df = pd.read_csv('data/spotify_podcast_ep_data.csv', index_col=0)
     id_df = pd.read_csv('data/US_top50_podcasts_q1_to_q4_2021_processed.csv')
+    override_df = load_release_overrides('release_period_overrides.csv')
 
     '''
     Prepare publisher data for pie chart
@@ -202,7 +312,45 @@ if __name__ == "__main__":
     '''
     Prepare release period data for distribution graph
     '''
+    # Get the first and last episode release dates of each podcast, streaming through the episode data
+    ep_release_df = aggregate_release_dates('data/spotify_podcast_ep_data.csv')
     # Process data
-    podcast_release_df = get_release_period(id_df, ep_df)
+    podcast_release_df = get_release_period(id_df, ep_release_df, override_df)
     # Save data
-    podcast_release_df.to_csv('data/podcast_release_periods.csv')
\ No newline at end of file
+    podcast_release_df.to_csv('data/podcast_release_periods.csv')
+
+    '''
+    Prepare release cadence data for cadence graphs
+    '''
+    # Load episode release dates
+    ep_df = pd.read_csv('data/spotify_podcast_ep_data.csv', usecols=['podcast_id', 'release_date'],
+                        dtype={'podcast_id': str})
+    # Process data
+    cadence_df = get_release_cadence(ep_df)
+    cadence_df = cadence_df.merge(id_df[['podcast_id', 'podcast_title']], on='podcast_id', how='left')
+    # Save data
+    cadence_df.to_csv('data/podcast_release_cadence.csv')
+
+    '''
+    Prepare rolling publisher share data from quarterly charts
+    '''
+    if os.path.exists('data/US_top50_podcasts_quarterly_charts.csv'):
+        chart_df = pd.read_csv('data/US_top50_podcasts_quarterly_charts.csv')
+        if os.path.exists('data/publisher_counts_by_quarter.csv'):
+            # Load previous results and only process quarters that haven't been processed yet
+            counts_df = pd.read_csv('data/publisher_counts_by_quarter.csv', index_col=0)
+            shares_df = pd.read_csv('data/rolling_publisher_shares.csv', index_col=0)
+            churn_df = pd.read_csv('data/rolling_publisher_churn.csv', index_col=0)
+            for df in [counts_df, shares_df, churn_df]:
+                df['quarter'] = pd.PeriodIndex(df['quarter'], freq='Q')
+            new_chart_df = chart_df[~pd.PeriodIndex(chart_df['quarter'].astype(str), freq='Q')
+                                    .isin(counts_df['quarter'])]
+            if not new_chart_df.empty:
+                counts_df, shares_df, churn_df = update_publisher_shares(counts_df, shares_df, churn_df, new_chart_df)
+        else:
+            counts_df = count_publisher_podcasts(chart_df)
+            shares_df, churn_df = get_rolling_publisher_shares(counts_df)
+        # Save data
+        counts_df.to_csv('data/publisher_counts_by_quarter.csv')
+        shares_df.to_csv('data/rolling_publisher_shares.csv')
+        churn_df.to_csv('data/rolling_publisher_churn.csv')
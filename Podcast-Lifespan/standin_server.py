@@ -0,0 +1,134 @@
+import pandas as pd
+import argparse
+import json
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+# Local stand-in for the Spotify Web API's shows/{id}/episodes endpoint, so the crawler in get_data.py can be run
+# and tested offline. Episodes are replayed from a saved episode csv file (output of get_data), newest first,
+# and requests over the rate limit get 429 Too Many Requests with a Retry-After header. Usage:
+#   python standin_server.py data/spotify_podcast_ep_data.csv --podcasts data/US_top50_podcasts_q1_to_q4_2021_processed.csv
+# then pass base_url='http://127.0.0.1:8000/v1' to get_all_episode_data or sync_all_episode_data
+
+def load_shows(episode_path, podcast_path=None):
+    '''
+    Load the episodes of each podcast, in the order the Spotify API returns them (newest first)
+    :param episode_path: (string) saved episode csv file
+    :param podcast_path: (string) csv file with podcast IDs; podcasts in it that have no saved episodes are served
+                         as shows with no episodes (None = only podcasts in the episode file are served)
+    :return: shows: (dictionary) podcast ID -> list of episodes (dictionaries with the fields used by get_data)
+    '''
+    ep_df = pd.read_csv(episode_path, index_col=0, dtype={'podcast_id': str, 'episode_id': str, 'episode_title': str,
+                                                          'release_date': str}, keep_default_na=False)
+    ep_df = ep_df.sort_values('release_date', ascending=False, kind='stable')
+
+    shows = {podcast_id: [{'id': episode_id, 'name': name, 'duration_ms': int(duration_ms), 'release_date': release_date}
+                          for episode_id, name, duration_ms, release_date
+                          in podcast_df[['episode_id', 'episode_title', 'duration_ms', 'release_date']]
+                             .itertuples(index=False)]
+             for podcast_id, podcast_df in ep_df.groupby('podcast_id', sort=False)}
+
+    # Add podcasts with no saved episodes
+    if podcast_path is not None:
+        for podcast_id in pd.read_csv(podcast_path, keep_default_na=False)['podcast_id']:
+            if podcast_id != '':
+                shows.setdefault(podcast_id, [])
+
+    return shows
+
+class RequestWindow:
+    '''
+    Counts requests in the current 1 second window, to enforce a per-second rate limit
+    '''
+    def __init__(self, rate):
+        '''
+        :param rate: (int) max number of requests per second (None = no limit)
+        '''
+        self.rate = rate
+        self.window_start = time.monotonic()
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def allow(self):
+        '''
+        :return: (bool) True if a request can be served now
+        '''
+        if self.rate is None:
+            return True
+        with self.lock:
+            now = time.monotonic()
+            if now - self.window_start >= 1:
+                self.window_start = now
+                self.count = 0
+            self.count += 1
+            return self.count <= self.rate
+
+def make_handler(shows, window):
+    '''
+    :param shows: (dictionary) podcast ID -> list of episodes, newest first (output of load_shows)
+    :param window: (RequestWindow) rate limit shared by all requests
+    :return: (class) request handler for the stand-in server
+    '''
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlparse(self.path)
+            parts = url.path.strip('/').split('/')
+
+            if not window.allow():
+                self.send_json(429, {'error': {'status': 429, 'message': 'API rate limit exceeded'}},
+                               {'Retry-After': '1'})
+            elif len(parts) != 4 or parts[0] != 'v1' or parts[1] != 'shows' or parts[3] != 'episodes':
+                self.send_json(404, {'error': {'status': 404, 'message': 'Service not found'}})
+            elif parts[2] not in shows:
+                self.send_json(404, {'error': {'status': 404, 'message': 'Non existing id'}})
+            else:
+                # Return one page of episodes
+                params = parse_qs(url.query)
+                offset = int(params.get('offset', ['0'])[0])
+                limit = int(params.get('limit', ['20'])[0])
+                episodes = shows[parts[2]]
+                self.send_json(200, {'items': episodes[offset:offset + limit], 'offset': offset, 'limit': limit,
+                                     'total': len(episodes)})
+
+        def send_json(self, status, body, headers=None):
+            data = json.dumps(body).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            # Don't print a line for every request
+            pass
+
+    return Handler
+
+def create_server(shows, host='127.0.0.1', port=8000, rate=None):
+    '''
+    Create the stand-in server (call serve_forever on it, or run it on a thread with serve_forever as the target)
+    :param shows: (dictionary) podcast ID -> list of episodes, newest first (output of load_shows)
+    :param host: (string) host to listen on
+    :param port: (int) port to listen on (0 = any free port)
+    :param rate: (int) max number of requests per second before 429s are returned (None = no limit)
+    :return: server: (ThreadingHTTPServer) the server
+    '''
+    return ThreadingHTTPServer((host, port), make_handler(shows, RequestWindow(rate)))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Replay saved podcast episodes as a local Spotify API stand-in')
+    parser.add_argument('episode_path', help='saved episode csv file')
+    parser.add_argument('--podcasts', help='podcast ID csv file (podcasts with no saved episodes are served empty)')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--rate', type=int, default=10, help='max requests per second before 429s are returned')
+    args = parser.parse_args()
+
+    shows = load_shows(args.episode_path, args.podcasts)
+    server = create_server(shows, port=args.port, rate=args.rate)
+    print('Serving ' + str(len(shows)) + ' podcasts at http://127.0.0.1:' + str(args.port) + '/v1')
+    server.serve_forever()
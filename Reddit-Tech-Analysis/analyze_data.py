@@ -2,15 +2,73 @@ import pandas as pd
 import matplotlib.pyplot as plt
 import matplotlib.gridspec as grid_spec
 import numpy as np
-from sklearn.neighbors import KernelDensity
+from scipy.signal import fftconvolve
 from matplotlib.ticker import FuncFormatter
 from matplotlib.patches import Patch
+from post_store import PostStore
+import os
+import hashlib
 
 
-def ridge_plots(processed_df):
+# Bump this whenever get_densities changes, so that densities calculated by an older version are recalculated
+DENSITY_VERSION = 1
+
+def get_densities(ratios, bandwidth=0.03, grid_size=1000, cache_dir=None):
+    '''
+    Estimate the gaussian kernel density of upvote ratios on a fixed [0,1] grid for every group at once,
+    by binning the ratios onto the grid and convolving the bins with the kernel via FFT
+    :param ratios: (dictionary) group name -> (numpy array) upvote ratios
+    :param bandwidth: (float) kernel bandwidth
+    :param grid_size: (int) number of grid points
+    :param cache_dir: (string) directory where densities are saved, keyed by a hash of the inputs (None = no cache)
+    :return: x_d: (numpy array) grid points
+             densities: (dictionary) group name -> (numpy array) density at each grid point
+    '''
+    x_d = np.linspace(0, 1, grid_size)
+    names = list(ratios)
+    ratios = [np.asarray(ratios[name], dtype=float) for name in names]
+
+    # Load the densities if they've already been calculated for these inputs
+    if cache_dir is not None:
+        hasher = hashlib.sha256(str((DENSITY_VERSION, bandwidth, grid_size, names)).encode())
+        for x in ratios:
+            hasher.update(str(len(x)).encode())
+            hasher.update(np.ascontiguousarray(x).tobytes())
+        cache_path = os.path.join(cache_dir, hasher.hexdigest() + '.npy')
+        if os.path.exists(cache_path):
+            return x_d, dict(zip(names, np.load(cache_path)))
+
+    # Split each ratio between the 2 nearest grid points, in proportion to how close it is to each
+    group = np.concatenate([np.full(len(x), i) for i, x in enumerate(ratios)]).astype(np.int64)
+    pos = np.clip(np.concatenate(ratios), 0, 1) * (grid_size - 1)
+    left = np.minimum(np.floor(pos).astype(np.int64), grid_size - 2)
+    right_weight = pos - left
+    bins = np.bincount(group * grid_size + left, weights=1 - right_weight, minlength=len(names) * grid_size)
+    bins += np.bincount(group * grid_size + left + 1, weights=right_weight, minlength=len(names) * grid_size)
+    bins = bins.reshape(len(names), grid_size)
+
+    # Convolve every group's bins with the gaussian kernel, evaluated at every distance between 2 grid points
+    offsets = np.arange(-(grid_size - 1), grid_size) / (grid_size - 1)
+    kernel = np.exp(-0.5 * (offsets / bandwidth) ** 2) / (bandwidth * np.sqrt(2 * np.pi))
+    densities = fftconvolve(bins, kernel[None, :], mode='same', axes=1)
+
+    # Average over the number of ratios in each group (FFT rounding can leave tiny negative values)
+    counts = np.array([max(len(x), 1) for x in ratios])
+    densities = np.clip(densities / counts[:, None], 0, None)
+
+    # Save the densities
+    if cache_dir is not None:
+        os.makedirs(cache_dir, exist_ok=True)
+        np.save(cache_path, densities)
+
+    return x_d, dict(zip(names, densities))
+
+def ridge_plots(processed_df=None, store=None, cache_dir='data/density_cache'):
     '''
     Plots the distribution of reddit posts' upvote ratios for various streaming services by topic
     :param processed_df: Pandas dataframe with reddit post data
+    :param store: (PostStore) post store to query instead of processed_df
+    :param cache_dir: (string) directory where distribution data is cached (None = no cache)
     :return: None
     '''
 
@@ -21,6 +79,17 @@ def ridge_plots(processed_df):
     service_keys = ['Hulu', 'HBOMAX', 'peacock']
     topics = ['Other', 'Tech Support']
 
+    # Get upvote ratio data for each service and topic
+    keys = [(service_key, i) for service_key in service_keys for i in range(2)]
+    if store is not None:
+        ratios = {key: store.get_upvote_ratios(*key) for key in keys}
+    else:
+        groups = {key: x.to_numpy() for key, x in processed_df.groupby(['service', 'tech_flag']).upvote_ratio}
+        ratios = {key: groups.get(key, np.array([])) for key in keys}
+
+    # Get distribution data for every service and topic at once
+    x_d, densities = get_densities(ratios, bandwidth=0.03, grid_size=1000, cache_dir=cache_dir)
+
     # For each service (3 total), create a ridge plot
     for n in range(3):
         # Initialize the plot
@@ -38,16 +107,10 @@ def ridge_plots(processed_df):
             # Create a new axes object and append it to ax_objs
             ax_objs.append(fig.add_subplot(gs[i:i + 1, 0:]))
 
-            # Get upvote ratio data and distribution data
-            x = np.array(processed_df[(processed_df.service == service_key) & (processed_df.tech_flag == i)].upvote_ratio)
-            x_d = np.linspace(0, 1, 1000)
-            kde = KernelDensity(bandwidth=0.03, kernel='gaussian')
-            kde.fit(x[:, None])
-            logprob = kde.score_samples(x_d[:, None])
-
             # Plot the distribution
-            ax_objs[i].plot(x_d, np.exp(logprob), color="#000000", lw=0.75)
-            ax_objs[i].fill_between(x_d, np.exp(logprob), alpha=0.5, color=graph_colours[i])
+            density = densities[(service_key, i)]
+            ax_objs[i].plot(x_d, density, color="#000000", lw=0.75)
+            ax_objs[i].fill_between(x_d, density, alpha=0.5, color=graph_colours[i])
 
             # Format the graph
 
@@ -118,10 +181,11 @@ def ridge_plots(processed_df):
 
         plt.show()
 
-def pie_chart(ml_df):
+def pie_chart(ml_df=None, store=None):
     '''
     Plots pie charts of sentiment analysis results for tech/other reddit posts for each service
     :param ml_df: Pandas dataframe with sentiment analysis results
+    :param store: (PostStore) post store to query instead of ml_df
     :return: None
     '''
 
@@ -136,8 +200,14 @@ def pie_chart(ml_df):
     # Iterate through subplots and plot each pie chart
     for i in range(2):
         for j in range(3):
+            # Get the % of posts with each label
+            if store is not None:
+                pcts = store.get_sentiment_pcts(service_keys[j], 1-i)
+            else:
+                pcts = ml_df[(ml_df.service == service_keys[j]) & (ml_df.tech_flag == 1-i)].new_pct
+
             # Plot pie chart
-            wedges, texts, autotexts = ax_pie[i, j].pie(ml_df[(ml_df.service == service_keys[j]) & (ml_df.tech_flag == 1-i)].new_pct,
+            wedges, texts, autotexts = ax_pie[i, j].pie(pcts,
                                                         autopct='%1.0f%%',
                                                         normalize=False,
                                                         startangle=90,
@@ -173,12 +243,20 @@ def pie_chart(ml_df):
     plt.show()
 
 if __name__ == "__main__":
-    # Load data
-    processed_df = pd.read_csv('data/processed_posts.csv', index_col=0)
-    ml_df = pd.read_csv('data/ml_results.csv', index_col=0)
+    if os.path.exists('data/posts.db'):
+        # Query just the slices each graph needs from the post store (built by post_store.py from the same latest
+        # pull of each service as processed_posts.csv, unless it was built with latest_only = False)
+        store = PostStore('data/posts.db')
+        ridge_plots(store=store)
+        pie_chart(store=store)
+        store.close()
+    else:
+        # Load data
+        processed_df = pd.read_csv('data/processed_posts.csv', index_col=0)
+        ml_df = pd.read_csv('data/ml_results.csv', index_col=0)
 
-    # Create ridge plot
-    ridge_plots(processed_df)
+        # Create ridge plot
+        ridge_plots(processed_df)
 
-    # Create pie chart
-    pie_chart(ml_df)
\ No newline at end of file
+        # Create pie chart
+        pie_chart(ml_df)
@@ -1,77 +1,257 @@
-import praw
 import pandas as pd
 from datetime import datetime
 import time
+import asyncio
+import aiohttp
 
 
-def get_reddit_data(service):
+# Reddit OAuth API base url (can be pointed at a local stand-in server for offline runs)
+REDDIT_API_URL = 'https://oauth.reddit.com'
+
+# Key attributes to pull for each post, mapped to their field names in the listing payload returned by Reddit
+POST_ATTRIBUTES = {'id': 'id', 'title': 'title', 'body': 'selftext', 'score': 'score',
+                   'num_comments': 'num_comments', 'upvote_ratio': 'upvote_ratio', 'tag': 'link_flair_text',
+                   'publish_date': 'created_utc'}
+
+def write_posts(columns, service, output_path, start_index):
     '''
-    Get the top 1000 posts on the given service's subreddit in the past year + key attributes for each post
+    Append a batch of posts to a csv file
+    :param columns: (dictionary) attribute name -> list of values for each post in the batch
+    :param service (string): title of the streaming service's subreddit
+    :param output_path: (string) csv file that post data is appended to
+    :param start_index: (int) row index of the first post in the batch
+    :return: None
+    '''
+    batch_df = pd.DataFrame(columns, index=range(start_index, start_index + len(columns['id'])))
+    # Add the subreddit name to the batch
+    batch_df['service'] = service
+    batch_df.to_csv(output_path, mode='a', header=False)
+
+def get_reddit_data(reddit, service, output_path, batch_size=500):
+    '''
+    Get the top 1000 posts on the given service's subreddit in the past year + key attributes for each post,
+    and save them to a csv file in batches
+    :param reddit: (praw Reddit) Reddit instance (ex. praw.Reddit(client_id=..., client_secret=..., user_agent=...))
     :param service (string): title of the streaming service's subreddit (capitalization matters)
-    :return: data_df: Pandas dataframe with subreddit post + attributes
+    :param output_path: (string) csv file that post data is saved to
+    :param batch_size: (int) number of posts held in memory before they're written to the csv file
+    :return: num_posts: (int) number of posts saved
     '''
 
     # Get the top 1000 posts in the past year
     posts = reddit.subreddit(service).top(limit=1000, time_filter='year')
 
-    # List key attributes to pull for each post
-    attributes = ['id','title', 'body', 'score', 'num_comments', 'upvote_ratio','tag','publish_date',]
+    # Start the csv file with just the header
+    pd.DataFrame(columns=list(POST_ATTRIBUTES) + ['service']).to_csv(output_path)
 
-    # Initialize a dataframe
-    data_df = pd.DataFrame(columns=attributes)
+    # Initialize one list per attribute
+    columns = {attribute: [] for attribute in POST_ATTRIBUTES}
+    num_posts = 0
 
     # Save each post's attributes
-    for i, post in enumerate(posts):
-        row = {}
+    for post in posts:
+        # Read attributes straight from the listing payload that's already been fetched
+        # (attribute access on a PRAW object can trigger another request if a field is missing)
+        payload = vars(post)
+        for attribute, field in POST_ATTRIBUTES.items():
+            columns[attribute].append(payload.get(field))
 
-        # Add the post ID
-        row[attributes[0]] = post.id
+        # Write full batches to the csv file
+        if len(columns['id']) == batch_size:
+            write_posts(columns, service, output_path, num_posts)
+            num_posts += batch_size
+            columns = {attribute: [] for attribute in POST_ATTRIBUTES}
 
-        # Add the post title
-        row[attributes[1]] = post.title
+    # Write the last batch
+    if columns['id']:
+        write_posts(columns, service, output_path, num_posts)
+        num_posts += len(columns['id'])
 
-        # Add the body of the post
-        row[attributes[2]] = post.selftext
+    return num_posts
 
-        # Add the post score
-        row[attributes[3]] = post.score
+class RateBudget:
+    '''
+    Request budget shared by every subreddit being fetched, kept in sync with Reddit's rate limit headers
+    (X-Ratelimit-Remaining = requests left in the current window, X-Ratelimit-Reset = seconds until the window resets)
+    '''
+    def __init__(self, remaining=100, reset=60.0, reserve=2):
+        '''
+        :param remaining: (int) requests assumed to be left before the first response comes back
+        :param reset: (float) seconds assumed to be left in the first window
+        :param reserve: (int) number of requests to hold back in each window
+        '''
+        self.remaining = remaining
+        self.window_size = remaining
+        self.reset_at = time.monotonic() + reset
+        self.reserve = reserve
+        self.in_flight = 0
+        self.lock = asyncio.Lock()
 
-        # Add the total number of comments on the post
-        row[attributes[4]] = post.num_comments
+    async def acquire(self):
+        '''
+        Wait until a request fits in the budget, then use it up
+        '''
+        async with self.lock:
+            # If the window is used up, wait for it to reset (other requests queue up behind the lock).
+            # Responses that arrive during the wait can push the reset back, so check again after each wait
+            while self.remaining - self.reserve <= 0:
+                await asyncio.sleep(max(self.reset_at - time.monotonic(), 0))
+                # Assume a full window until a response says otherwise
+                if time.monotonic() >= self.reset_at:
+                    self.remaining = self.window_size
+            self.remaining -= 1
+            self.in_flight += 1
 
-        # Add the percentage of upvotes out of all votes on the post
-        row[attributes[5]] = post.upvote_ratio
+    def release(self):
+        '''
+        Record that a request is no longer in flight (whether it got a response or failed)
+        '''
+        self.in_flight -= 1
 
-        # Add the post's flair (aka tag)
-        row[attributes[6]] = post.link_flair_text
+    def update(self, headers):
+        '''
+        Sync the budget with the rate limit headers of a response (call before the request is released)
+        :param headers: (dictionary) response headers
+        '''
+        if 'X-Ratelimit-Remaining' not in headers:
+            return
+        # Requests that were sent after this one (every request in flight except this one) aren't counted
+        # in the header yet
+        header_remaining = int(float(headers['X-Ratelimit-Remaining']))
+        self.remaining = header_remaining - (self.in_flight - 1)
+        self.reset_at = time.monotonic() + float(headers.get('X-Ratelimit-Reset', 0))
+        self.window_size = max(self.window_size, header_remaining)
 
-        # Add the publish date
-        row[attributes[7]] = post.created_utc
+async def get_listing_page(session, budget, url, params, max_retries=5):
+    '''
+    Get one page of a subreddit listing, staying within the shared rate budget
+    :param session: (aiohttp ClientSession) session with the auth + user agent headers
+    :param budget: (RateBudget) rate budget shared by all subreddits
+    :param url: (string) listing url
+    :param params: (dictionary) query parameters
+    :param max_retries: (int) number of times to retry a rate limited or failed request
+    :return: (dictionary) listing data
+    '''
+    for attempt in range(max_retries + 1):
+        await budget.acquire()
+        try:
+            async with session.get(url, params=params) as response:
+                budget.update(response.headers)
 
-        # Save the post to the dataframe
-        data_df.loc[i] = row
+                # If rate limited, use up the rest of the window and try again
+                if response.status == 429 or response.status >= 500:
+                    if attempt == max_retries:
+                        response.raise_for_status()
+                    if response.status == 429:
+                        budget.remaining = 0
+                        budget.reset_at = max(budget.reset_at,
+                                              time.monotonic() + float(response.headers.get('Retry-After', 1)))
+                    else:
+                        await asyncio.sleep(2 ** attempt)
+                    continue
 
-    # Add the subreddit name to the dataframe
-    data_df['service'] = service
+                response.raise_for_status()
+                return (await response.json())['data']
+        finally:
+            # Free the request's slot even if it failed, so later responses aren't offset by it forever
+            budget.release()
 
-    return data_df
+async def fetch_subreddit(session, budget, service, output_path, base_url=REDDIT_API_URL, limit=1000,
+                          time_filter='year'):
+    '''
+    Get the top posts on a subreddit from the raw listing endpoint + key attributes for each post,
+    and save them to a csv file once the subreddit is done
+    :param session: (aiohttp ClientSession) session with the auth + user agent headers
+    :param budget: (RateBudget) rate budget shared by all subreddits
+    :param service (string): title of the streaming service's subreddit
+    :param output_path: (string) csv file that post data is saved to
+    :param base_url: (string) Reddit API url
+    :param limit: (int) max number of posts
+    :param time_filter: (string) time period of the top posts
+    :return: num_posts: (int) number of posts saved
+    '''
+    url = base_url + '/r/' + service + '/top'
+    columns = {attribute: [] for attribute in POST_ATTRIBUTES}
+    after = None
 
-if __name__ == "__main__":
-    # Load today's date
-    todays_date = datetime.today().strftime('%Y-%m-%d')
+    # Page through the listing (max 100 posts per page)
+    while len(columns['id']) < limit:
+        params = {'t': time_filter, 'limit': min(100, limit - len(columns['id'])), 'raw_json': 1}
+        if after:
+            params['after'] = after
+        listing = await get_listing_page(session, budget, url, params)
 
-    # Create a read-only Reddit instance
-    reddit = praw.Reddit(client_id="XXXXXXXXXXXXXXXXXX", client_secret="XXXXXXXXXXXXXX", user_agent="XXXXXXXXXXXXXXXX")
+        # Save each post's attributes
+        for child in listing['children']:
+            for attribute, field in POST_ATTRIBUTES.items():
+                columns[attribute].append(child['data'].get(field))
 
-    for service in ['Hulu','HBOMAX','peacock']:
+        # Stop after the last page
+        after = listing.get('after')
+        if not after or not listing['children']:
+            break
 
-        print("pulling "+service+" data...")
+    # Save the subreddit's posts
+    pd.DataFrame(columns=list(POST_ATTRIBUTES) + ['service']).to_csv(output_path)
+    write_posts(columns, service, output_path, 0)
 
-        # Get reddit data
-        df = get_reddit_data(service)
+    return len(columns['id'])
+
+async def get_access_token(session, client_id, client_secret):
+    '''
+    Get an application-only OAuth token for the Reddit API
+    :param session: (aiohttp ClientSession) session with the user agent header
+    :param client_id: (string) Reddit app client id
+    :param client_secret: (string) Reddit app client secret
+    :return: (string) access token
+    '''
+    async with session.post('https://www.reddit.com/api/v1/access_token', data={'grant_type': 'client_credentials'},
+                            auth=aiohttp.BasicAuth(client_id, client_secret)) as response:
+        response.raise_for_status()
+        return (await response.json())['access_token']
+
+async def get_all_reddit_data(services, output_paths, user_agent, token=None, client_id=None, client_secret=None,
+                              base_url=REDDIT_API_URL, max_concurrency=8, budget=None):
+    '''
+    Get the top posts on several subreddits concurrently, under one shared rate budget.
+    Each subreddit's csv file is saved as soon as it's done
+    :param services: (list of strings) titles of the streaming services' subreddits
+    :param output_paths: (list of strings) csv file for each subreddit
+    :param user_agent: (string) user agent sent with each request
+    :param token: (string) OAuth token (None = get one with client_id + client_secret)
+    :param client_id: (string) Reddit app client id
+    :param client_secret: (string) Reddit app client secret
+    :param base_url: (string) Reddit API url
+    :param max_concurrency: (int) max number of subreddits fetched at once
+    :param budget: (RateBudget) rate budget shared by all subreddits (None = start with the default)
+    :return: num_posts: (dictionary) number of posts saved for each subreddit
+    '''
+    budget = budget or RateBudget()
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async with aiohttp.ClientSession(headers={'User-Agent': user_agent}) as session:
+        if token is None:
+            token = await get_access_token(session, client_id, client_secret)
+        session.headers['Authorization'] = 'bearer ' + token
+
+        async def fetch(service, output_path):
+            async with semaphore:
+                num_posts = await fetch_subreddit(session, budget, service, output_path, base_url)
+                print("saved " + str(num_posts) + " " + service + " posts")
+                return num_posts
+
+        results = await asyncio.gather(*[fetch(service, path) for service, path in zip(services, output_paths)])
+
+    return dict(zip(services, results))
+
+if __name__ == "__main__":
+    # Load today's date
+    todays_date = datetime.today().strftime('%Y-%m-%d')
 
-        # Save the data in a pandas dataframe
-        df.to_csv('data/'+service+'_'+todays_date+'.csv')
+    services = ['Hulu','HBOMAX','peacock']
 
-        # Wait 1 min after querying each podcast
-        time.sleep(60)
\ No newline at end of file
+    # Pull every subreddit concurrently under one shared rate budget
+    print("pulling " + ", ".join(services) + " data...")
+    asyncio.run(get_all_reddit_data(services, ['data/'+service+'_'+todays_date+'.csv' for service in services],
+                                    user_agent="XXXXXXXXXXXXXXXX", client_id="XXXXXXXXXXXXXXXXXX",
+                                    client_secret="XXXXXXXXXXXXXX"))
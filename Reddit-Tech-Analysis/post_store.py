@@ -0,0 +1,147 @@
+import pandas as pd
+import numpy as np
+import sqlite3
+import glob
+import os
+from sentiment import ml_results_columns
+from process_data import find_latest_snapshots
+
+# Columns saved for each post
+POST_COLUMNS = ['id', 'service', 'title', 'body', 'score', 'num_comments', 'upvote_ratio', 'tag', 'publish_date',
+                'tech_flag']
+
+class PostStore:
+    '''
+    Local sqlite store of subreddit posts and sentiment analysis results, indexed for the slices used by the graphs
+    '''
+    def __init__(self, path):
+        '''
+        :param path: (string) sqlite database file
+        '''
+        self.conn = sqlite3.connect(path)
+        self.conn.execute('CREATE TABLE IF NOT EXISTS posts (id TEXT PRIMARY KEY, service TEXT, title TEXT, body TEXT, '
+                          'score INTEGER, num_comments INTEGER, upvote_ratio REAL, tag TEXT, publish_date REAL, '
+                          'tech_flag INTEGER)')
+        self.conn.execute('CREATE INDEX IF NOT EXISTS posts_service_tech_date ON posts (service, tech_flag, publish_date)')
+        self.conn.execute('CREATE TABLE IF NOT EXISTS sentiment_stats (model TEXT, service TEXT, tech_flag INTEGER, '
+                          'label TEXT, label_counts INTEGER, avg_score REAL, pct REAL, '
+                          'PRIMARY KEY (model, service, tech_flag, label))')
+        self.conn.commit()
+
+    def upsert_posts(self, raw_df, tech_label=None, replace_services=False):
+        '''
+        Save posts, replacing any post with the same id that was saved by an earlier pull
+        :param raw_df: (pandas dataframe) raw subreddit data (output of get_data)
+        :param tech_label: (string) name of the subreddit's tech support label (None = use raw_df's tech_flag column)
+        :param replace_services: (bool) if True, first delete every saved post of the services in raw_df, so the
+                                 store only holds this pull for them
+        :return: (int) number of posts saved
+        '''
+        posts = raw_df.copy()
+
+        # Flag all tech support posts
+        if tech_label is not None:
+            posts['tech_flag'] = (posts['tag'] == tech_label).astype(int)
+
+        # Convert to plain python values (sqlite can't save numpy types or NaN)
+        posts = posts[POST_COLUMNS].astype(object).where(posts[POST_COLUMNS].notna(), None)
+        rows = list(posts.itertuples(index=False, name=None))
+
+        with self.conn:
+            if replace_services:
+                self.conn.executemany('DELETE FROM posts WHERE service = ?',
+                                      [(service,) for service in posts['service'].unique()])
+            self.conn.executemany('INSERT INTO posts VALUES (' + ','.join('?' * len(POST_COLUMNS)) + ') '
+                                  'ON CONFLICT (id) DO UPDATE SET '
+                                  + ', '.join(col + ' = excluded.' + col for col in POST_COLUMNS[1:]), rows)
+
+        return len(rows)
+
+    def save_sentiment_stats(self, all_stats):
+        '''
+        Save sentiment analysis stats, replacing earlier stats for the same model, service, tech flag and label
+        :param all_stats: (pandas dataframe) stats in the ml_results.csv layout (output of
+                          sentiment.get_sentiment_stats)
+        :return: None
+        '''
+        # Reshape to one row per model, service, tech flag and label (every model has a <model>_label_counts column)
+        models = [col[:-len('_label_counts')] for col in all_stats.columns if col.endswith('_label_counts')]
+        rows = []
+        for model in models:
+            columns = ml_results_columns(model)
+            model_stats = all_stats.dropna(subset=[columns['label_counts']])
+            rows += [(model, service, int(tech_flag), label, int(counts), float(avg_score), float(pct))
+                     for service, tech_flag, label, counts, avg_score, pct
+                     in model_stats[['service', 'tech_flag', columns['label'], columns['label_counts'],
+                                     columns['avg_score'], columns['pct']]].itertuples(index=False, name=None)]
+
+        with self.conn:
+            self.conn.executemany('INSERT OR REPLACE INTO sentiment_stats VALUES (?, ?, ?, ?, ?, ?, ?)', rows)
+
+    def get_upvote_ratios(self, service, tech_flag, start_date=None, end_date=None):
+        '''
+        Get the upvote ratios of one service's posts on one topic
+        :param service: (string) subreddit name
+        :param tech_flag: (int) 1 = tech support posts, 0 = other posts
+        :param start_date: (float) earliest publish date, in seconds since the epoch (None = no limit)
+        :param end_date: (float) latest publish date, in seconds since the epoch (None = no limit)
+        :return: (numpy array) upvote ratios
+        '''
+        query = 'SELECT upvote_ratio FROM posts WHERE service = ? AND tech_flag = ?'
+        params = [service, tech_flag]
+        if start_date is not None:
+            query += ' AND publish_date >= ?'
+            params.append(start_date)
+        if end_date is not None:
+            query += ' AND publish_date <= ?'
+            params.append(end_date)
+
+        return np.array([row[0] for row in self.conn.execute(query, params)], dtype=float)
+
+    def get_sentiment_pcts(self, service, tech_flag, model='new_bert'):
+        '''
+        Get the percentage of one service's posts on one topic with each sentiment label
+        :param service: (string) subreddit name
+        :param tech_flag: (int) 1 = tech support posts, 0 = other posts
+        :param model: (string) sentiment model name
+        :return: (pandas series) percentage of posts, indexed by label (in alphabetical order)
+        '''
+        rows = self.conn.execute('SELECT label, pct FROM sentiment_stats WHERE model = ? AND service = ? '
+                                 'AND tech_flag = ? ORDER BY label', [model, service, tech_flag]).fetchall()
+        return pd.Series([pct for _, pct in rows], index=[label for label, _ in rows], dtype=float)
+
+    def close(self):
+        self.conn.close()
+
+
+if __name__ == "__main__":
+    # List out subreddit info for each service
+    file_info = [['Hulu', 'Technical Support'], ['HBOMAX', 'Tech Support'],
+                 ['peacock', 'Technical Support']]
+
+    # Set to False to keep every pull's posts in the store (the graphs will then cover every post ever pulled),
+    # instead of only each service's latest pull, which is what process_data uses
+    latest_only = True
+
+    store = PostStore('data/posts.db')
+
+    if latest_only:
+        # Replace each service's posts with its latest pull
+        snapshots = find_latest_snapshots([service for service, _ in file_info])
+        for service, tech_label in file_info:
+            if service in snapshots:
+                raw_df = pd.read_csv(snapshots[service], index_col=0, keep_default_na=False)
+                print("saved " + str(store.upsert_posts(raw_df, tech_label, replace_services=True)) + " posts from "
+                      + snapshots[service])
+    else:
+        # Save every pull for each service, oldest first, so posts pulled more than once keep their latest values
+        for service, tech_label in file_info:
+            for path in sorted(glob.glob('data/' + service + '_????-??-??.csv')):
+                raw_df = pd.read_csv(path, index_col=0, keep_default_na=False)
+                print("saved " + str(store.upsert_posts(raw_df, tech_label)) + " posts from " + path)
+
+    # Save sentiment analysis results
+    if os.path.exists('data/ml_results.csv'):
+        store.save_sentiment_stats(pd.read_csv('data/ml_results.csv', index_col=0))
+
+    store.close()
@@ -1,49 +1,199 @@
 import pandas as pd
+import os
+import re
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
 
-def process_data(file_info):
+# Keywords that point to a tech support post, by category
+TECH_VOCABULARY = {
+    'playback': ['buffering', 'buffers', 'lagging', 'stuttering', 'freezing', 'freezes', 'frozen', 'black screen',
+                 'no sound', 'no audio', 'out of sync', 'pixelated', 'keeps pausing', "won't play", 'wont play',
+                 'not loading', "won't load", 'stuck loading', 'playback'],
+    'error': ['error', 'error code', 'bug', 'buggy', 'glitch', 'glitching', 'crash', 'crashes', 'crashing',
+              'app crash', 'not working', "isn't working", "doesn't work", 'stopped working', 'broken'],
+    'account': ['login', 'log in', 'logged out', 'logging in', 'sign in', 'signed out', 'password', 'reset my password',
+                'verification code', 'two factor', 'locked out'],
+    'billing': ['billing', 'charged twice', 'double charged', 'refund', 'payment failed', 'card declined'],
+    'device': ['roku', 'firestick', 'fire stick', 'fire tv', 'apple tv', 'smart tv', 'chromecast', 'android tv',
+               'reinstall', 'reinstalled', 'clear cache', 'cleared cache', 'app update', 'update broke'],
+}
+
+def trie_regex(node):
     '''
-    Process raw subreddit data
-    :param file_info: list of subreddit names and tech support label names for each service
-    :return: posts_df: Pandas dataframe with processed subreddit data for all the inputted services
-             stats_df: Pandas dataframe with stats on the number of tech supports posts on each service's subreddit
+    Convert a character trie into a regex, so that keywords with a shared prefix are matched by walking the trie
+    instead of trying each keyword in turn
+    :param node: (dictionary) trie node: character -> child node ('' marks the end of a keyword)
+    :return: (string) regex
     '''
+    # Any whitespace can separate the words of a keyword
+    branches = [(r'\s+' if ch == ' ' else re.escape(ch)) + trie_regex(node[ch]) for ch in sorted(node) if ch]
+    if not branches:
+        return ''
+    regex = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
 
-    # Initialize dataframes
-    stats_df = pd.DataFrame(columns=['service', 'num tech posts', 'total posts', 'pct of tech posts'])
+    # If a keyword ends here, the rest is optional (greedy, so the longest keyword is matched first)
+    if '' in node:
+        regex = ('(?:' + regex + ')' if len(branches) == 1 else regex) + '?'
+    return regex
 
-    posts_col = ['service', 'tech_flag', 'score', 'num_comments', 'upvote_ratio', 'title', 'all text']
-    posts_df = pd.DataFrame(columns=posts_col)
+def compile_vocabulary(vocabulary):
+    '''
+    Compile all keywords into one case-insensitive pattern (each keyword should only be in one category)
+    :param vocabulary: (dictionary) category -> list of keywords
+    :return: pattern: (compiled regex) matches any keyword
+             keyword_cats: (dictionary) normalized keyword -> category number
+    '''
+    # Build a character trie of all keywords, in lowercase with single spaces between words
+    trie = {}
+    keyword_cats = {}
+    for i, keywords in enumerate(vocabulary.values()):
+        for keyword in keywords:
+            keyword = ' '.join(keyword.lower().split())
+            keyword_cats[keyword] = i
+            node = trie
+            for ch in keyword:
+                node = node.setdefault(ch, {})
+            node[''] = {}
+
+    pattern = re.compile(r'\b(' + trie_regex(trie) + r')\b', re.IGNORECASE)
+    return pattern, keyword_cats
+
+def count_keyword_hits(texts, vocabulary=TECH_VOCABULARY, chunk_size=100000):
+    '''
+    Count the keyword hits in each category for each text, scanning a whole chunk of texts in a single pass
+    :param texts: (pandas series) post text
+    :param vocabulary: (dictionary) category -> list of keywords
+    :param chunk_size: (int) number of texts scanned per pass
+    :return: hits_df: (pandas dataframe) number of hits per category for each text (same index as texts)
+    '''
+    pattern, keyword_cats = compile_vocabulary(vocabulary)
+    num_cats = len(vocabulary)
+    texts = texts.fillna('').astype(str)
+    hits = np.zeros((len(texts), num_cats), dtype=np.int64)
+
+    for start in range(0, len(texts), chunk_size):
+        chunk = texts.iloc[start:start + chunk_size]
+
+        # Join the chunk into one string, separated by a character that can't be part of a match
+        joined = '\x00'.join(chunk)
+        # Position in the joined string where each text ends
+        text_ends = np.cumsum(chunk.str.len().to_numpy() + 1) - 1
+
+        # Find every keyword in the chunk, recording the position and category of each match
+        matches = [(m.start(), keyword_cats[' '.join(m.group(1).lower().split())]) for m in pattern.finditer(joined)]
+        if not matches:
+            continue
+        positions, cats = np.array(matches).T
 
-    # For each service, load the raw data, process it, record its stats and add it to the posts_df
-    for i in range(len(file_info)):
-        # Get the service's subreddit name and the name of its tech support label
-        service = file_info[i][0]
-        tech_label = file_info[i][1]
+        # Map each match back to its text and count the hits per text and category
+        text_idx = start + np.searchsorted(text_ends, positions)
+        hits += np.bincount(text_idx * num_cats + cats, minlength=hits.size).reshape(hits.shape)
+
+    return pd.DataFrame(hits, index=texts.index, columns=[cat + '_hits' for cat in vocabulary])
+
+def classify_tech_posts(posts_df, vocabulary=TECH_VOCABULARY, min_hits=2):
+    '''
+    Pre-classify tech support posts from keyword hits in their text, so that only ambiguous posts need a model
+    :param posts_df: (pandas dataframe) processed post data, with the tech_flag (from flair) and all text columns
+    :param vocabulary: (dictionary) category -> list of keywords
+    :param min_hits: (int) min number of keyword hits for a post to count as tech support
+    :return: hits_df: (pandas dataframe) hits per category, total hits and keyword_tech_flag for each post
+             (1 = flaired as tech support or at least min_hits hits, 0 = no hits, missing = ambiguous)
+    '''
+    hits_df = count_keyword_hits(posts_df['all text'], vocabulary)
+    hits_df['total_hits'] = hits_df.sum(axis=1)
 
-        print("processing " + service + " data...")
+    # Flag posts as tech support, not tech support or ambiguous
+    hits_df['keyword_tech_flag'] = pd.array(np.where(hits_df['total_hits'] == 0, 0, 1), dtype='Int64')
+    ambiguous = (hits_df['total_hits'] > 0) & (hits_df['total_hits'] < min_hits) & (posts_df['tech_flag'] == 0)
+    hits_df.loc[ambiguous, 'keyword_tech_flag'] = pd.NA
+    hits_df.loc[posts_df['tech_flag'] == 1, 'keyword_tech_flag'] = 1
 
-        # Load the raw data
-        raw_df = pd.read_csv('data/' + service + '_2022-09-25.csv', index_col=0, keep_default_na=False)
+    return hits_df
 
-        # Flag all tech support posts
-        processed_df = raw_df.copy()
-        processed_df['tech_flag'] = 0
-        processed_df.loc[processed_df['tag'] == tech_label, 'tech_flag'] = 1
+def find_latest_snapshots(services, data_dir='data'):
+    '''
+    Find the most recent raw data file for each service (files are named <subreddit>_<YYYY-MM-DD>.csv)
+    :param services: (list of strings) subreddit names
+    :param data_dir: (string) directory with the raw data files
+    :return: snapshots: (dictionary) subreddit name -> path of its latest raw data file
+    '''
+    services = set(services)
+    snapshots = {}
+    latest_dates = {}
+
+    # Scan the directory once, keeping the latest date for each service
+    for file_name in os.listdir(data_dir):
+        match = re.fullmatch(r'(.+)_(\d{4}-\d{2}-\d{2})\.csv', file_name)
+        if match is None or match.group(1) not in services:
+            continue
+        service, snapshot_date = match.groups()
+        if snapshot_date > latest_dates.get(service, ''):
+            latest_dates[service] = snapshot_date
+            snapshots[service] = os.path.join(data_dir, file_name)
+
+    return snapshots
+
+def load_posts(path, service, tech_label, posts_col):
+    '''
+    Load and process one service's raw subreddit data
+    :param path: (string) raw data file
+    :param service: (string) subreddit name
+    :param tech_label: (string) name of the subreddit's tech support label
+    :param posts_col: (list of strings) output columns
+    :return: processed_df: Pandas dataframe with the service's processed posts
+    '''
+    # Load the raw data
+    processed_df = pd.read_csv(path, index_col=0, keep_default_na=False,
+                               usecols=['Unnamed: 0', 'title', 'body', 'score', 'num_comments', 'upvote_ratio', 'tag'])
+    processed_df['service'] = service
+
+    # Flag all tech support posts
+    processed_df['tech_flag'] = (processed_df['tag'] == tech_label).astype(int)
+
+    # Combine post title and body into one column
+    processed_df['all text'] = processed_df['title'].astype(str) + '. ' + processed_df['body'].astype(str)
+
+    # Rearrange column order and filter for relevant columns
+    return processed_df[posts_col]
+
+def process_data(file_info, data_dir='data', max_workers=8):
+    '''
+    Process raw subreddit data, using the latest raw data file for each service
+    :param file_info: list of subreddit names and tech support label names for each service
+    :param data_dir: (string) directory with the raw data files
+    :param max_workers: (int) max number of files read at once
+    :return: posts_df: Pandas dataframe with processed subreddit data for all the inputted services
+             (incl. keyword hits per category and keyword_tech_flag, see classify_tech_posts)
+             stats_df: Pandas dataframe with stats on the number of tech supports posts on each service's subreddit
+             (raises a FileNotFoundError if there's no raw data file for any of the services)
+    '''
+    posts_col = ['service', 'tech_flag', 'score', 'num_comments', 'upvote_ratio', 'title', 'all text']
 
-        # Combine post title and body into one column
-        processed_df['all text'] = processed_df[['title','body']].apply(lambda row: '. '.join(row.values.astype(str)), axis=1)
+    # Find the latest raw data file for each service
+    snapshots = find_latest_snapshots([service for service, _ in file_info], data_dir)
+    for service, _ in file_info:
+        if service not in snapshots:
+            print("no data found for " + service)
+    if not snapshots:
+        raise FileNotFoundError('no raw data files (<subreddit>_<YYYY-MM-DD>.csv) found in ' + data_dir + ' for '
+                                + ', '.join(service for service, _ in file_info))
+    file_info = [(service, tech_label) for service, tech_label in file_info if service in snapshots]
 
-        # Rearrange column order and filter for relevant columns
-        processed_df = processed_df[posts_col]
+    # Load and process every service's raw data, then combine them all at once
+    print("processing " + str(len(file_info)) + " subreddits...")
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        processed = executor.map(lambda info: load_posts(snapshots[info[0]], info[0], info[1], posts_col), file_info)
+        posts_df = pd.concat(list(processed), axis=0, ignore_index=True, sort=False)
 
-        # Record stats
-        stats_df.loc[i, 'service'] = service
-        stats_df.loc[i, 'num tech posts'] = processed_df[processed_df['tech_flag'] == 1].shape[0]
-        stats_df.loc[i, 'total posts'] = processed_df.shape[0]
-        stats_df.loc[i, 'pct of tech posts'] = stats_df.loc[i, 'num tech posts'] / stats_df.loc[i, 'total posts']
+    # Record stats for all services in one grouped aggregation
+    stats_df = posts_df.groupby('service', sort=False).agg(**{'num tech posts': ('tech_flag', 'sum'),
+                                                              'total posts': ('tech_flag', 'size')})
+    stats_df['pct of tech posts'] = stats_df['num tech posts'] / stats_df['total posts']
+    stats_df = stats_df.reset_index()
 
-        # Add subreddit data to posts_df
-        posts_df = pd.concat([posts_df, processed_df], axis=0, ignore_index=True, sort=False)
+    # Add keyword hits for each post, to catch tech support posts without a tech support flair
+    posts_df = pd.concat([posts_df, classify_tech_posts(posts_df)], axis=1)
 
     return posts_df, stats_df
 
@@ -57,4 +207,4 @@ if __name__ == "__main__":
 
     # Save processed data
     posts_df.to_csv('data/processed_posts.csv')
-    stats_df.to_csv('data/processed_stats.csv')
\ No newline at end of file
+    stats_df.to_csv('data/processed_stats.csv')
@@ -0,0 +1,255 @@
+import pandas as pd
+import numpy as np
+import hashlib
+import sqlite3
+
+# Label names for models that only output LABEL_0, LABEL_1, ...
+BERT_LABELS = {'LABEL_0': 'negative', 'LABEL_1': 'neutral', 'LABEL_2': 'positive'}
+
+# ml_results.csv column names for each model's label, # of posts, average score and % of posts
+# (the names the original notebook saved, which analyze_data reads)
+ML_RESULTS_COLUMNS = {'orig_bert': {'label': 'orig_bert_processed_label', 'label_counts': 'orig_bert_label_counts',
+                                    'avg_score': 'orig_bert_avg_score', 'pct': 'orig_pct'},
+                      'new_bert': {'label': 'new_bert_label', 'label_counts': 'new_bert_label_counts',
+                                   'avg_score': 'new_bert_score_avg_score', 'pct': 'new_pct'},
+                      'gen_bert': {'label': 'gen_bert_processed_label', 'label_counts': 'gen_bert_label_counts',
+                                   'avg_score': 'gen_bert_score', 'pct': 'gen_pct'}}
+
+class TransformersModel:
+    '''
+    Hugging Face sentiment classifier, run on batches of texts that are padded to the longest text in the batch.
+    Any object with the same attributes (model_id, label_map) and methods (token_lengths, predict) can be used instead
+    '''
+    def __init__(self, model_id, label_map=None, max_length=512, device='cpu'):
+        '''
+        :param model_id: (string) Hugging Face model id
+        :param label_map: (dictionary) model label -> label name (labels not in the map are kept as is)
+        :param max_length: (int) max number of tokens per text (longer texts are truncated)
+        :param device: (string) torch device the model is run on
+        '''
+        # Only import transformers when a real model is used
+        import torch
+        from transformers import AutoTokenizer, AutoModelForSequenceClassification
+
+        self.torch = torch
+        self.model_id = model_id
+        self.label_map = label_map or {}
+        self.max_length = max_length
+        self.device = device
+        self.tokenizer = AutoTokenizer.from_pretrained(model_id)
+        self.model = AutoModelForSequenceClassification.from_pretrained(model_id).to(device).eval()
+
+    def token_lengths(self, texts):
+        '''
+        :param texts: (list of strings) texts to measure
+        :return: (list of ints) number of tokens in each text
+        '''
+        encoded = self.tokenizer(texts, truncation=True, max_length=self.max_length)
+        return [len(ids) for ids in encoded['input_ids']]
+
+    def predict(self, texts):
+        '''
+        :param texts: (list of strings) one batch of texts
+        :return: labels, scores: (lists) top label and its probability for each text
+        '''
+        # Pad to the longest text in the batch only
+        inputs = self.tokenizer(texts, padding=True, truncation=True, max_length=self.max_length,
+                                return_tensors='pt').to(self.device)
+        with self.torch.no_grad():
+            probs = self.torch.softmax(self.model(**inputs).logits, dim=-1)
+        scores, label_ids = probs.max(dim=-1)
+
+        labels = [self.model.config.id2label[i] for i in label_ids.tolist()]
+        return labels, scores.tolist()
+
+class SentimentCache:
+    '''
+    Local store of sentiment results for each (model id, text hash), so texts are only scored once per model
+    '''
+    def __init__(self, path):
+        '''
+        :param path: (string) sqlite database file
+        '''
+        self.conn = sqlite3.connect(path)
+        self.conn.execute('CREATE TABLE IF NOT EXISTS results (model_id TEXT, text_hash TEXT, label TEXT, score REAL, '
+                          'PRIMARY KEY (model_id, text_hash))')
+        self.conn.commit()
+
+    def get(self, model_id, text_hashes):
+        '''
+        :param model_id: (string) model id
+        :param text_hashes: (list of strings) text hashes to look up
+        :return: (dictionary) text hash -> (label, score) for every text hash that's in the cache
+        '''
+        results = {}
+        # Look up the hashes in chunks to stay under sqlite's limit on query parameters
+        for i in range(0, len(text_hashes), 500):
+            chunk = text_hashes[i:i + 500]
+            rows = self.conn.execute('SELECT text_hash, label, score FROM results WHERE model_id = ? AND text_hash IN ('
+                                     + ','.join('?' * len(chunk)) + ')', [model_id] + chunk)
+            results.update({text_hash: (label, score) for text_hash, label, score in rows})
+        return results
+
+    def save(self, model_id, text_hashes, labels, scores):
+        '''
+        :param model_id: (string) model id
+        :param text_hashes: (list of strings) hash of each scored text
+        :param labels: (list of strings) label for each text
+        :param scores: (list of floats) score for each text
+        '''
+        self.conn.executemany('INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)',
+                              [(model_id, h, l, float(s)) for h, l, s in zip(text_hashes, labels, scores)])
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+def text_hash(text):
+    '''
+    :param text: (string) text
+    :return: (string) hex digest of the text
+    '''
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+def score_texts(model, texts, cache, batch_size=32):
+    '''
+    Get the sentiment label and score of each text, only running the model on texts that aren't in the cache.
+    Texts are sorted by token length and split into batches, so each batch is padded to a similar length
+    :param model: (TransformersModel or any object with the same interface) sentiment classifier
+    :param texts: (list of strings) texts to score
+    :param cache: (SentimentCache) result cache
+    :param batch_size: (int) number of texts per batch
+    :return: labels, scores: (lists) model label and score for each text
+    '''
+    hashes = [text_hash(text) for text in texts]
+
+    # Find the unique texts that haven't been scored by this model yet
+    results = cache.get(model.model_id, list(set(hashes)))
+    new_texts = {}
+    for h, text in zip(hashes, texts):
+        if h not in results:
+            new_texts[h] = text
+    new_hashes = list(new_texts)
+    new_texts = list(new_texts.values())
+
+    if new_texts:
+        print("scoring " + str(len(new_texts)) + " new texts with " + model.model_id + "...")
+
+        # Sort the new texts by token length so that texts of a similar length are batched together
+        order = np.argsort(model.token_lengths(new_texts), kind='stable')
+
+        # Score each batch and save it to the cache straight away, so an interrupted run can pick up where it left off
+        for i in range(0, len(order), batch_size):
+            batch = order[i:i + batch_size]
+            batch_hashes = [new_hashes[j] for j in batch]
+            labels, scores = model.predict([new_texts[j] for j in batch])
+            cache.save(model.model_id, batch_hashes, labels, scores)
+            results.update({h: (label, score) for h, label, score in zip(batch_hashes, labels, scores)})
+
+    labels = [results[h][0] for h in hashes]
+    scores = [results[h][1] for h in hashes]
+    return labels, scores
+
+def score_posts(posts, models, cache_path, text_col='title', batch_size=32, mask=None):
+    '''
+    Run each sentiment model on the posts
+    :param posts: (pandas dataframe) reddit post data
+    :param models: (dictionary) model name -> model (TransformersModel or any object with the same interface)
+    :param cache_path: (string) sqlite database file for the result cache
+    :param text_col: (string) column with the text to score
+    :param batch_size: (int) number of texts per batch
+    :param mask: (pandas series of bools) posts to score, ex. posts['keyword_tech_flag'].isna() to only score posts
+                 the keyword pre-classifier found ambiguous (None = score every post)
+    :return: posts: (pandas dataframe) post data with a <name>_label and <name>_score column for each model
+             (missing for posts that weren't scored)
+    '''
+    posts = posts.copy()
+    scored = posts.index if mask is None else posts.index[mask.to_numpy(dtype=bool)]
+    texts = posts.loc[scored, text_col].astype(str).tolist()
+
+    cache = SentimentCache(cache_path)
+    try:
+        for name, model in models.items():
+            labels, scores = score_texts(model, texts, cache, batch_size)
+
+            # Convert labels to names, in lowercase to make it easier for processing
+            posts[name + '_label'] = pd.Series(labels, index=scored, dtype=object).replace(model.label_map)\
+                                       .str.lower().reindex(posts.index)
+            posts[name + '_score'] = pd.Series(scores, index=scored, dtype=float).reindex(posts.index)
+    finally:
+        cache.close()
+
+    return posts
+
+def ml_results_columns(name):
+    '''
+    :param name: (string) model name
+    :return: (dictionary) stat ('label', 'label_counts', 'avg_score' or 'pct') -> ml_results.csv column name
+             (models that aren't in ML_RESULTS_COLUMNS use <name>_label, <name>_label_counts, <name>_avg_score
+             and <name>_pct)
+    '''
+    return ML_RESULTS_COLUMNS.get(name, {stat: name + '_' + stat for stat in ['label', 'label_counts', 'avg_score',
+                                                                             'pct']})
+
+def get_sentiment_stats(posts, model_names):
+    '''
+    Get the number of posts, average score and percentage of posts for each label, service and tech flag,
+    for every model in one grouped aggregation
+    :param posts: (pandas dataframe) post data with a <name>_label and <name>_score column for each model
+                  (posts that weren't scored are left out)
+    :param model_names: (list of strings) model names
+    :return: all_stats: (pandas dataframe) one row per service, tech flag and label, in the ml_results.csv layout:
+             a label, # of posts, average score and % of posts column for each model (see ml_results_columns)
+    '''
+    # Reshape model outputs to long format: one row per post and model
+    long_df = pd.concat([posts[['service', 'tech_flag', name + '_label', name + '_score']]
+                         .set_axis(['service', 'tech_flag', 'label', 'score'], axis=1).assign(model=name)
+                         for name in model_names], ignore_index=True)
+
+    # Get the total number of posts and average score per model, service, tech flag and label
+    stats = long_df.groupby(['model', 'service', 'tech_flag', 'label']).agg(label_counts=('score', 'size'),
+                                                                           avg_score=('score', 'mean'))
+
+    # Get percentages out of the total number of posts per model, service and tech flag
+    totals = stats.groupby(level=['model', 'service', 'tech_flag'])['label_counts'].transform('sum')
+    stats['pct'] = stats['label_counts'] / totals
+
+    # Reshape to one row per service, tech flag and label, with a set of columns for each model
+    stats = stats.unstack('model').reset_index()
+    all_stats = {'service': stats['service'], 'tech_flag': stats['tech_flag']}
+    for name in model_names:
+        columns = ml_results_columns(name)
+        counts = stats[('label_counts', name)]
+        # Each model's label column is empty on rows with a label the model never gave
+        all_stats[columns['label']] = stats['label'].where(counts.notna())
+        all_stats[columns['label_counts']] = counts.astype(int) if counts.notna().all() else counts
+        all_stats[columns['avg_score']] = stats[('avg_score', name)]
+        all_stats[columns['pct']] = stats[('pct', name)]
+
+    return pd.DataFrame(all_stats)
+
+
+if __name__ == "__main__":
+    # Load subreddit post data
+    posts = pd.read_csv('data/processed_posts.csv', index_col=0)
+
+    # Original BERT model, new BERT model (both trained on Twitter data) and the generic model
+    models = {'orig_bert': TransformersModel('cardiffnlp/twitter-roberta-base-sentiment', label_map=BERT_LABELS),
+              'new_bert': TransformersModel('cardiffnlp/twitter-roberta-base-sentiment-latest'),
+              'gen_bert': TransformersModel('Seethal/sentiment_analysis_generic_dataset', label_map=BERT_LABELS)}
+
+    # Score every post, since analyze_data.pie_chart compares tech support posts with other posts. Set to True to only
+    # score the posts that the keyword pre-classifier (see process_data.classify_tech_posts) couldn't settle as tech
+    # support or not (the other posts get no sentiment, so pie_chart can't be used)
+    ambiguous_only = False
+
+    # Perform sentiment analysis on the titles of each reddit post
+    mask = posts['keyword_tech_flag'].isna() if ambiguous_only else None
+    posts = score_posts(posts, models, 'data/sentiment_cache.db', mask=mask)
+
+    # Get the stats for each model
+    all_stats = get_sentiment_stats(posts, list(models))
+
+    # Save results
+    posts.to_csv('data/sentiment_posts.csv')
+    all_stats.to_csv('data/ml_results.csv', encoding='utf-8-sig')
@@ -0,0 +1,153 @@
+import pandas as pd
+import argparse
+import glob
+import json
+import os
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+# Local stand-in for Reddit's /r/<subreddit>/top listing endpoint, so the concurrent fetcher in get_data.py can be
+# run and tested offline. Posts are replayed from saved subreddit csv files (output of get_data), and every response
+# carries X-Ratelimit-* headers for a shared request window (429 Too Many Requests once the window is used up). Usage:
+#   python standin_server.py data/Hulu_2023-01-01.csv data/HBOMAX_2023-01-01.csv data/peacock_2023-01-01.csv
+# then run get_all_reddit_data with token='standin' and base_url='http://127.0.0.1:8000'
+
+# Listing field name for each column saved by get_data
+LISTING_FIELDS = {'id': 'id', 'title': 'title', 'body': 'selftext', 'score': 'score', 'num_comments': 'num_comments',
+                  'upvote_ratio': 'upvote_ratio', 'tag': 'link_flair_text', 'publish_date': 'created_utc'}
+
+def load_subreddits(paths):
+    '''
+    Load the posts of each subreddit, in the order of the top listing (highest score first)
+    :param paths: (list of strings) saved subreddit csv files
+    :return: subreddits: (dictionary) lowercase subreddit name -> list of posts (dictionaries with listing fields)
+    '''
+    subreddits = {}
+    for path in paths:
+        posts = pd.read_csv(path, index_col=0)
+        posts = posts.sort_values('score', ascending=False, kind='stable')
+        # Save missing values (ex. posts with no tag) as null, like the listing does
+        posts = posts.astype(object).where(posts.notna(), None)
+        service = posts['service'].iloc[0] if len(posts) > 0 else os.path.basename(path).rsplit('_', 1)[0]
+        subreddits[service.lower()] = [{field: post[col] for col, field in LISTING_FIELDS.items()}
+                                       for post in posts.to_dict('records')]
+
+    return subreddits
+
+class RequestWindow:
+    '''
+    Fixed window of requests shared by all clients, like Reddit's per-app rate limit
+    '''
+    def __init__(self, size, seconds):
+        '''
+        :param size: (int) number of requests allowed in each window
+        :param seconds: (float) length of each window in seconds
+        '''
+        self.size = size
+        self.seconds = seconds
+        self.window_start = time.monotonic()
+        self.used = 0
+        self.num_requests = 0
+        self.num_rejected = 0
+        self.lock = threading.Lock()
+
+    def use(self):
+        '''
+        Count a request against the current window
+        :return: allowed, remaining, reset: (bool) True if the request can be served, (int) requests left in the
+                 window, (float) seconds until the window resets
+        '''
+        with self.lock:
+            now = time.monotonic()
+            if now - self.window_start >= self.seconds:
+                self.window_start = now
+                self.used = 0
+            self.used += 1
+            self.num_requests += 1
+            allowed = self.used <= self.size
+            if not allowed:
+                self.num_rejected += 1
+            return allowed, max(self.size - self.used, 0), self.window_start + self.seconds - now
+
+def make_handler(subreddits, window):
+    '''
+    :param subreddits: (dictionary) lowercase subreddit name -> list of posts (output of load_subreddits)
+    :param window: (RequestWindow) rate limit window shared by all requests
+    :return: (class) request handler for the stand-in server
+    '''
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlparse(self.path)
+            parts = url.path.strip('/').split('/')
+            allowed, remaining, reset = window.use()
+            headers = {'X-Ratelimit-Remaining': str(float(remaining)), 'X-Ratelimit-Used': str(window.used),
+                       'X-Ratelimit-Reset': str(int(reset) + 1)}
+
+            if not allowed:
+                headers['Retry-After'] = headers['X-Ratelimit-Reset']
+                self.send_json(429, {'message': 'Too Many Requests', 'error': 429}, headers)
+            elif len(parts) != 3 or parts[0] != 'r' or parts[2] != 'top' or parts[1].lower() not in subreddits:
+                self.send_json(404, {'message': 'Not Found', 'error': 404}, headers)
+            else:
+                # Return the page of posts after the 'after' post
+                params = parse_qs(url.query)
+                limit = min(int(params.get('limit', ['25'])[0]), 100)
+                posts = subreddits[parts[1].lower()]
+                start = 0
+                if 'after' in params:
+                    after_id = params['after'][0].split('_', 1)[-1]
+                    start = next((i + 1 for i, post in enumerate(posts) if post['id'] == after_id), len(posts))
+                page = posts[start:start + limit]
+                after = 't3_' + page[-1]['id'] if page and start + limit < len(posts) else None
+                self.send_json(200, {'kind': 'Listing',
+                                     'data': {'after': after, 'children': [{'kind': 't3', 'data': post}
+                                                                           for post in page]}}, headers)
+
+        def send_json(self, status, body, headers):
+            data = json.dumps(body).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            # Don't print a line for every request
+            pass
+
+    return Handler
+
+def create_server(subreddits, host='127.0.0.1', port=8000, window_size=100, window_seconds=60.0):
+    '''
+    Create the stand-in server (call serve_forever on it, or run it on a thread with serve_forever as the target).
+    The server's window attribute counts the requests it received and rejected
+    :param subreddits: (dictionary) lowercase subreddit name -> list of posts (output of load_subreddits)
+    :param host: (string) host to listen on
+    :param port: (int) port to listen on (0 = any free port)
+    :param window_size: (int) number of requests allowed in each window
+    :param window_seconds: (float) length of each window in seconds
+    :return: server: (ThreadingHTTPServer) the server
+    '''
+    window = RequestWindow(window_size, window_seconds)
+    server = ThreadingHTTPServer((host, port), make_handler(subreddits, window))
+    server.window = window
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Replay saved subreddit posts as a local Reddit API stand-in')
+    parser.add_argument('paths', nargs='*', help='saved subreddit csv files (default: every file in data/)')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--window-size', type=int, default=100, help='requests allowed in each rate limit window')
+    parser.add_argument('--window-seconds', type=float, default=60.0, help='length of each rate limit window')
+    args = parser.parse_args()
+
+    subreddits = load_subreddits(args.paths or sorted(glob.glob('data/*_????-??-??.csv')))
+    server = create_server(subreddits, port=args.port, window_size=args.window_size,
+                           window_seconds=args.window_seconds)
+    print('Serving ' + ', '.join(subreddits) + ' at http://127.0.0.1:' + str(args.port))
+    server.serve_forever()
@@ -0,0 +1,85 @@
+import numpy as np
+from scipy.signal import fftconvolve
+
+def year_density(y, yy):
+    '''
+    Estimate the gaussian kernel density of one year's values on an evenly spaced grid, by binning the values
+    onto the grid and convolving the bins with the kernel via FFT. Uses the same bandwidth as gaussian_kde (Scott's rule)
+    :param y: (numpy array) the year's values
+    :param yy: (numpy array) evenly spaced grid points
+    :return: (numpy array) normalized density at each grid point
+    '''
+    # Scott's rule bandwidth
+    bandwidth = np.std(y, ddof=1) * len(y) ** (-1 / 5)
+
+    # Extend the grid (keeping the same spacing) so that it covers every value
+    step = yy[1] - yy[0]
+    first = int(np.floor((min(yy[0], y.min()) - yy[0]) / step))
+    last = int(np.ceil((max(yy[-1], y.max()) - yy[0]) / step))
+    grid = yy[0] + step * np.arange(first, last + 1)
+
+    # Split each value between the 2 nearest grid points, in proportion to how close it is to each
+    pos = (y - grid[0]) / step
+    left = np.clip(np.floor(pos).astype(np.int64), 0, len(grid) - 2)
+    right_weight = pos - left
+    bins = np.bincount(left, weights=1 - right_weight, minlength=len(grid))
+    bins += np.bincount(left + 1, weights=right_weight, minlength=len(grid))
+
+    # Convolve the bins with the gaussian kernel (out to 4 bandwidths), FFT rounding can leave tiny negative values
+    half_width = min(int(np.ceil(4 * bandwidth / step)), len(grid) - 1)
+    offsets = np.arange(-half_width, half_width + 1) * step
+    kernel = np.exp(-0.5 * (offsets / bandwidth) ** 2) / (bandwidth * np.sqrt(2 * np.pi) * len(y))
+    density = np.clip(fftconvolve(bins, kernel, mode='same'), 0, None)
+
+    # Normalize with the mean and standard deviation of the density at each value
+    point_density = np.interp(y, grid, density)
+    norm_density = (density - np.mean(point_density)) / np.std(point_density)
+
+    return np.interp(yy, grid, norm_density)
+
+def density_grid(df, x_col, y_col, startyear, endyear, yy, xx_interval=0.1):
+    '''
+    Generates grid points for the density of y values in each year. Each year's density is calculated directly on the
+    y-axis grid and normalized, then interpolated between years along the x-axis
+    :param df: Pandas dataframe with year (x) and value (y) data
+    :param x_col: (string) year column
+    :param y_col: (string) value column
+    :param startyear: Start year of analysis
+    :param endyear: End year of analysis
+    :param yy: (numpy array) evenly spaced y-axis grid points
+    :param xx_interval: (float) x-axis grid spacing
+    :return: (X, Y, Z): Set of grid points (raises a ValueError if no year has at least 2 distinct y values)
+    '''
+    # Generate a mesh of points on the graph
+    xx = np.arange(startyear, endyear + xx_interval, xx_interval)
+    X, Y = np.meshgrid(xx, yy)
+
+    # Calculate the normalized density for each year (years need at least 2 distinct values)
+    years = []
+    columns = []
+    for year, y in df[(df[x_col] >= startyear) & (df[x_col] <= endyear)].groupby(x_col)[y_col]:
+        y = y.dropna().to_numpy(dtype=float)
+        if len(y) < 2 or np.std(y) == 0:
+            continue
+        years.append(year)
+        columns.append(year_density(y, yy))
+    if not years:
+        raise ValueError('no year from ' + str(startyear) + ' to ' + str(endyear) + ' has at least 2 distinct '
+                         + y_col + ' values to estimate a density from')
+    years = np.array(years, dtype=float)
+    columns = np.array(columns)
+
+    # Interpolate linearly between the 2 nearest years (mesh points outside the first and last year are left as nan)
+    Z = np.full(X.shape, np.nan)
+    inside = (xx >= years[0] - 1e-9) & (xx <= years[-1] + 1e-9)
+    if len(years) == 1:
+        Z[:, inside] = columns[0][:, None]
+    else:
+        left = np.clip(np.searchsorted(years, xx[inside], side='right') - 1, 0, len(years) - 2)
+        right_weight = np.clip((xx[inside] - years[left]) / (years[left + 1] - years[left]), 0, 1)
+        Z[:, inside] = (columns[left] * (1 - right_weight[:, None]) + columns[left + 1] * right_weight[:, None]).T
+
+    # Replace any np.nan values (mesh points outside of the years with data) with min value in mesh
+    Z = np.where(np.isnan(Z), np.nanmin(Z), Z)
+
+    return X, Y, Z
@@ -1,65 +1,28 @@
 import pandas as pd
 import matplotlib.pyplot as plt
 import numpy as np
-from scipy.stats import gaussian_kde
 import matplotlib as mpl
 import matplotlib.gridspec as grid_spec
-from scipy.interpolate import LinearNDInterpolator
+from density_grid import density_grid
 
 def generate_cts_density_grid(df, startyear, endyear):
     '''
-    Generates grid points for runtime density, using triangular interpolation
+    Generates grid points for runtime density, calculating each year's density directly on the runtime grid
+    and interpolating between years
     :param df: Pandas dataframe with movie runtime and release year data
     :param startyear: Start year of analysis
     :param endyear: End year of analysis
     :return: (X, Y, Z): Set of grid points
     '''
-
-    # Initialize lists for all x, y, and z points
-    all_z = []
-    all_x = []
-    all_y = []
-
-    # Calculate point density (z) at each point (x,y)
-    for year in range(startyear, endyear + 1):
-        x = df.loc[df['release year'] == year, 'release year'].to_numpy()
-        y = df.loc[df['release year'] == year, 'runtime'].to_numpy()
-
-        # Calculate the point density
-        z = gaussian_kde(y)(y)
-
-        # Normalize z values
-        mean = np.mean(z)
-        std = np.std(z)
-        norm_z = (z - mean) / std
-
-        # Append (x,y,z) to lists
-        all_z.extend(norm_z)
-        all_x.extend(x)
-        all_y.extend(y)
-
     # Set parameters for x & y axis on the graph
     xx_interval = 0.1
     yy_min = 85
     yy_max = 125
     yy_interval = 0.1
 
-    # Generate a mesh of points on the graph
-    xx = np.arange(startyear, endyear + xx_interval, xx_interval)
+    # Calculate the normalized runtime density on a mesh of points on the graph
     yy = np.arange(yy_min, yy_max, yy_interval)
-
-    # Use triangular interpolation to approximate z points
-    tri_interp = LinearNDInterpolator(list(zip(all_x, all_y)), all_z)
-
-    # Generate mesh
-    X, Y = np.meshgrid(xx, yy)
-    Z = tri_interp(X, Y)
-
-    # Replace any np.nan values (arise when mesh points are outside of the interpolation boundaries,
-    # so they'd require extrapolation to be approximated) with min value in mesh
-    Z = np.where(np.isnan(Z), np.nanmin(Z), Z)
-
-    return X, Y, Z
+    return density_grid(df, 'release year', 'runtime', startyear, endyear, yy, xx_interval)
 
 def density_plots(bo_df, s_df, startyear, endyear):
     '''
@@ -143,11 +106,11 @@ def density_plots(bo_df, s_df, startyear, endyear):
 
 if __name__ == "__main__":
     # Load box office data
-    bo_df = pd.read_csv('../data/processed_boxoffice_films_runtime.csv', index_col=0)
+    bo_df = pd.read_csv('data/processed_boxoffice_films_runtime.csv', index_col=0)
     bo_df = bo_df.drop(columns='title')
 
     # Load streaming data
-    s_df = pd.read_csv('../data/processed_streaming_films_runtime.csv', index_col=0)
+    s_df = pd.read_csv('data/processed_streaming_films_runtime.csv', index_col=0)
     s_df = s_df.drop(columns='title')
     # Drop rows for titles with release year = 2015, since there's only 2 titles (too little data)
     s_df = s_df[s_df['release year'] != 2015]
@@ -1,66 +1,322 @@
 import requests
 from bs4 import BeautifulSoup
+import lxml.html
 import pandas as pd
 from datetime import datetime
+from urllib.parse import urlparse
+from concurrent.futures import ThreadPoolExecutor, Future
+import threading
+import sqlite3
+import json
+import time
+import os
 
-def get_boxofficemojo_data(url_prefix, url_suffix, startyear, endyear):
+BOX_OFFICE_MOJO_URL = 'https://www.boxofficemojo.com'
+
+class HostRateLimiter:
+    '''
+    Token bucket rate limiter with a separate bucket for each host, shared by all threads
+    '''
+    def __init__(self, rate=5.0, capacity=5, host_rates=None):
+        '''
+        :param rate: (float) default max number of requests per second to each host
+        :param capacity: (int) max number of requests that can be sent to a host at once after it's been idle
+        :param host_rates: (dictionary) host -> max number of requests per second, for hosts that need their own rate
+        '''
+        self.rate = rate
+        self.capacity = capacity
+        self.host_rates = host_rates or {}
+        # host -> (tokens, last time tokens were added)
+        self.buckets = {}
+        self.lock = threading.Lock()
+
+    def acquire(self, url):
+        '''
+        Wait until a request can be sent to the url's host
+        :param url: (string) url that's about to be requested
+        '''
+        host = urlparse(url).netloc
+        rate = self.host_rates.get(host, self.rate)
+        while True:
+            with self.lock:
+                # Top up the host's bucket for the time since it was last used
+                now = time.monotonic()
+                tokens, last = self.buckets.get(host, (self.capacity, now))
+                tokens = min(self.capacity, tokens + (now - last) * rate)
+                if tokens >= 1:
+                    self.buckets[host] = (tokens - 1, now)
+                    return
+                self.buckets[host] = (tokens, now)
+                wait = (1 - tokens) / rate
+            time.sleep(wait)
+
+def get_page(session, limiter, url, max_retries=5, timeout=30):
+    '''
+    Send a HTTP request to the webpage, retrying with exponential backoff if the request fails
+    :param session: (requests Session) session with pooled connections
+    :param limiter: (HostRateLimiter) rate limiter shared by all threads
+    :param url: (string) webpage url
+    :param max_retries: (int) number of times to retry a failed request
+    :param timeout: (float) seconds to wait for a response
+    :return: (string) page HTML
+    '''
+    for attempt in range(max_retries + 1):
+        limiter.acquire(url)
+        try:
+            website_req = session.get(url, timeout=timeout)
+        except requests.RequestException:
+            if attempt == max_retries:
+                raise
+            time.sleep(min(2 ** attempt, 60))
+            continue
+
+        # If rate limited or the server had an error, wait and try again
+        if website_req.status_code == 429 or website_req.status_code >= 500:
+            if attempt == max_retries:
+                website_req.raise_for_status()
+            time.sleep(float(website_req.headers.get('Retry-After', min(2 ** attempt, 60))))
+            continue
+
+        website_req.raise_for_status()
+        return website_req.text
+
+def parse_year_page(html):
+    '''
+    Get the links to each film's title page from a table of the top 200 movies of a year
+    :param html: (string) year page HTML
+    :return: (list of strings) title page links
+    '''
+    # Parse the HTML
+    website_soup = BeautifulSoup(html, 'html.parser')
+    # Parse list of top 200 films for <year>
+    parsed_table = website_soup.findAll('table')[0]
+    data = [
+            [col.a['href'] if col.find('a') else '' for col in row.find_all('td')]
+            for row in parsed_table.find_all('tr')]
+    # Note: Links to individual title pages are in Col 1
+    return [row[1] for row in data[1:]]
+
+def element_strings(element):
+    '''
+    Get every string in an element, in order, skipping comments, scripts and styles (same as BeautifulSoup's .strings)
+    :param element: (lxml element) element
+    :return: (list of strings) strings
+    '''
+    return element.xpath('.//text()[not(parent::script or parent::style)]')
+
+def parse_title_page(html):
+    '''
+    Get the movie title, release date and runtime from a film's title page.
+    Parses with lxml's C parser and only looks at the h1, re-release h2 and summary table
+    :param html: (string) title page HTML
+    :return: movie_data: (dictionary) title, release date and runtime (None if the film is a re-release)
+    '''
+    col_names = ['title', 'release date', 'runtime']
+    movie_data = {}
+    # Parse the HTML
+    title_tree = lxml.html.fromstring(html)
+
+    # If the movie is a re-release, skip it
+    if title_tree.xpath('//h2[contains(concat(" ", normalize-space(@class), " "), " a-size-medium ")][1]'):
+        return None
+
+    # Save movie title
+    title = title_tree.xpath('//h1[contains(concat(" ", normalize-space(@class), " "), " a-size-extra-large ")][1]')[0]
+    movie_data[col_names[0]] = ''.join(s.strip() for s in element_strings(title))
+
+    # Iterate through summary table to save film release date and runtime
+    title_summary = title_tree.xpath('//div[normalize-space(@class) = '
+                                     '"a-section a-spacing-none mojo-summary-values mojo-hidden-from-mobile"]')[0]
+    for summary_entry in title_summary.xpath('.//div[normalize-space(@class) = "a-section a-spacing-none"]'):
+        # Read the entry's spans once (label, value, ...)
+        spans = summary_entry.xpath('.//span')
+        label = ''.join(element_strings(spans[0]))
+        if label == 'Release Date':
+            # Save release date
+            movie_data[col_names[1]] = ''.join(s.strip() for s in element_strings(spans[1]))
+        elif label == 'Running Time':
+            # Save runtime
+            movie_data[col_names[2]] = ''.join(s.strip() for s in element_strings(spans[1]))
+
+    return movie_data
+
+def normalize_release_url(url):
+    '''
+    Normalize a title page link, so the same release always has the same key
+    (ex. '/release/rl1234/?ref_=bo_yld_table_1' -> '/release/rl1234/')
+    :param url: (string) title page link (relative or absolute)
+    :return: (string) normalized link
+    '''
+    return urlparse(url).path.rstrip('/').lower() + '/'
+
+class TitleCache:
+    '''
+    Persistent cache of the data extracted from each title page (title, release date, runtime), keyed by normalized
+    release link, plus the title page links on each year page. Also makes sure a title page that's on more than one
+    year page is only fetched once per crawl
+    '''
+    def __init__(self, path=':memory:'):
+        '''
+        :param path: (string) sqlite database file (':memory:' = only dedupe within one crawl)
+        '''
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute('CREATE TABLE IF NOT EXISTS titles (url TEXT PRIMARY KEY, rerelease INTEGER, title TEXT, '
+                          'release_date TEXT, runtime TEXT)')
+        self.conn.execute('CREATE TABLE IF NOT EXISTS year_pages (year INTEGER PRIMARY KEY, fetched_year INTEGER, '
+                          'title_urls TEXT)')
+        self.conn.commit()
+        self.lock = threading.Lock()
+
+        # Load cached title page data (None = re-release)
+        self.titles = {}
+        for url, rerelease, title, release_date, runtime in self.conn.execute('SELECT * FROM titles'):
+            movie_data = {'title': title, 'release date': release_date, 'runtime': runtime}
+            self.titles[url] = None if rerelease else {k: v for k, v in movie_data.items() if v is not None}
+
+        # Title pages currently being fetched
+        self.futures = {}
+
+    def get_title_data(self, url, page_pool, fetch):
+        '''
+        Get a future for a title page's data, only fetching the page if it isn't cached or already being fetched
+        :param url: (string) title page link
+        :param page_pool: (ThreadPoolExecutor) thread pool that title pages are fetched on
+        :param fetch: (function) fetches and parses a title page, given its link
+        :return: (Future) resolves to the title page data (None if the film is a re-release)
+        '''
+        key = normalize_release_url(url)
+        with self.lock:
+            if key in self.titles:
+                future = Future()
+                future.set_result(self.titles[key])
+                return future
+            if key not in self.futures:
+                self.futures[key] = page_pool.submit(self.fetch_title_data, key, url, fetch)
+            return self.futures[key]
+
+    def fetch_title_data(self, key, url, fetch):
+        '''
+        Fetch a title page and save its data
+        :param key: (string) normalized title page link
+        :param url: (string) title page link
+        :param fetch: (function) fetches and parses a title page, given its link
+        :return: movie_data: (dictionary) title page data (None if the film is a re-release)
+        '''
+        movie_data = fetch(url)
+        row = (key, 1, None, None, None) if movie_data is None else \
+            (key, 0, movie_data.get('title'), movie_data.get('release date'), movie_data.get('runtime'))
+        with self.lock:
+            self.titles[key] = movie_data
+            self.futures.pop(key, None)
+            self.conn.execute('INSERT OR REPLACE INTO titles VALUES (?, ?, ?, ?, ?)', row)
+            self.conn.commit()
+
+        return movie_data
+
+    def get_year_links(self, year):
+        '''
+        Get the cached title page links for a year, if they were saved after the year's rankings had settled
+        (i.e. fetched at least a full calendar year after the year ended)
+        :param year: (int) year
+        :return: (list of strings) title page links (None if they need to be fetched)
+        '''
+        with self.lock:
+            row = self.conn.execute('SELECT fetched_year, title_urls FROM year_pages WHERE year = ?', [year]).fetchone()
+        if row is None or row[0] < year + 2:
+            return None
+        return json.loads(row[1])
+
+    def save_year_links(self, year, title_urls):
+        '''
+        :param year: (int) year
+        :param title_urls: (list of strings) title page links on the year page
+        '''
+        with self.lock:
+            self.conn.execute('INSERT OR REPLACE INTO year_pages VALUES (?, ?, ?)',
+                              [year, datetime.today().year, json.dumps(title_urls)])
+            self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+def get_boxofficemojo_year(session, limiter, page_pool, cache, year, url, base_url, output_path=None):
+    '''
+    Get movie title, release date and runtime for each movie in one year's table of the top 200 movies,
+    fetching the title pages that aren't cached on a shared thread pool
+    :param session: (requests Session) session with pooled connections
+    :param limiter: (HostRateLimiter) rate limiter shared by all threads
+    :param page_pool: (ThreadPoolExecutor) thread pool that title pages are fetched on
+    :param cache: (TitleCache) title page cache
+    :param year: (int) year
+    :param url: (string) year page url
+    :param base_url: (string) Box Office Mojo url that title page links are relative to
+    :param output_path: (string) csv file that the year's data is saved to as soon as it's done (None = don't save)
+    :return: temp_df: Pandas dataframe containing the year's data
+    '''
+    col_names = ['title', 'release date', 'runtime']
+    # Get the title page links, from the cache if the year's rankings have settled
+    title_urls = cache.get_year_links(year)
+    if title_urls is None:
+        title_urls = parse_year_page(get_page(session, limiter, url))
+        cache.save_year_links(year, title_urls)
+
+    # Pull movie title, release date and runtime for every film at once
+    fetch = lambda title_url: parse_title_page(get_page(session, limiter, base_url + title_url))
+    futures = [cache.get_title_data(title_url, page_pool, fetch) for title_url in title_urls]
+
+    # Record data for films that aren't re-releases, keeping their position in the table as the index
+    rows = {i: future.result() for i, future in enumerate(futures)}
+    rows = {i: movie_data for i, movie_data in rows.items() if movie_data is not None}
+    temp_df = pd.DataFrame.from_dict(rows, orient='index', columns=col_names)
+
+    # Save the year's data
+    if output_path is not None:
+        temp_df.to_csv(output_path)
+
+    return temp_df
+
+def get_boxofficemojo_data(url_prefix, url_suffix, startyear, endyear, output_dir=None, base_url=BOX_OFFICE_MOJO_URL,
+                           max_years=4, max_workers=8, limiter=None, cache_path=None):
     '''
     Function gets movie title, release date and runtime for each movie in a table of
     the top 200 movies by gross box office revenue, each year.
+    Years are crawled concurrently, with their title pages fetched on a shared, rate limited thread pool
     :param url_prefix: Box Office Mojo domestic box office data url prefix
     :param url_suffix: Box Office Mojo domestic box office data url suffix
     :param startyear (int): Record box office data starting on this year
     :param endyear (int): Record box office data up to and including this year
+    :param output_dir (string): directory where each year's data is saved as raw_box_office_data_<year>.csv
+                                as soon as it's done (None = don't save)
+    :param base_url (string): Box Office Mojo url that title page links are relative to
+    :param max_years (int): max number of years crawled at once
+    :param max_workers (int): max number of title pages fetched at once
+    :param limiter (HostRateLimiter): per-host rate limiter (None = 5 requests per second to each host)
+    :param cache_path (string): sqlite file where title page data is cached between crawls
+                                (None = only dedupe title pages within this crawl)
     :return: Pandas dataframe containing data from Box Office Mojo
     '''
-    # Initialize Pandas dataframe
-    col_names = ['title', 'release date', 'runtime']
-    df = pd.DataFrame(columns=col_names)
+    limiter = limiter or HostRateLimiter()
+    cache = TitleCache(cache_path or ':memory:')
 
-    # Iterate through years from startyear to endyear
-    for year in range(startyear, endyear+1):
-        # Send a HTTP request to the webpage
-        website_req = requests.get(url_prefix+str(year)+url_suffix)
-        # Parse the HTML
-        website_soup = BeautifulSoup(website_req.text, 'html.parser')
-        # Parse list of top 200 films for <year>
-        parsed_table = website_soup.findAll('table')[0]
-        data = [
-                [col.a['href'] if col.find('a') else '' for col in row.find_all('td')]
-                for row in parsed_table.find_all('tr')]
-        # Save list of top 200 films to dataframe
-        # Note: Links to individual title pages are in Col 1
-        link_df = pd.DataFrame(data[1:], columns=[i for i in range(len(data[1]))])
-
-        temp_df = pd.DataFrame(columns=col_names)
-
-        # Pull movie title, release date and runtime
-        for i, title_url in enumerate(link_df.iloc[:,1].to_list()):
-            movie_data = {}
-            # Send a HTTP request to the webpage
-            title_website_req = requests.get('https://www.boxofficemojo.com'+title_url)
-            # Parse the HTML
-            title_soup = BeautifulSoup(title_website_req.text, 'html.parser')
-
-            # If the movie is not a re-release, record data
-            if not title_soup.find('h2', attrs={'class':'a-size-medium'}):
-                # Save movie title
-                movie_data[col_names[0]] = ''.join(title_soup.find('h1', attrs={'class':'a-size-extra-large'}).stripped_strings)
-
-                # Iterate through summary table to save film release date and runtime
-                title_summary = title_soup.find('div',
-                                                attrs={'class':'a-section a-spacing-none mojo-summary-values mojo-hidden-from-mobile' })
-                for summary_entry in title_summary.findAll('div', attrs={'class':'a-section a-spacing-none'}):
-                    if summary_entry.findAll('span')[0].text == 'Release Date':
-                        # Save release date
-                        movie_data[col_names[1]] = ''.join(summary_entry.findAll('span')[1].stripped_strings)
-                    elif summary_entry.findAll('span')[0].text == 'Running Time':
-                        # Save runtime
-                        movie_data[col_names[2]] = ''.join(summary_entry.findAll('span')[1].stripped_strings)
-                # Load movie data into temp dataframe
-                temp_df.loc[i] = movie_data
-        # Add temp dataframe to final dataframe for output
-        df = pd.concat([df, temp_df], axis=0, ignore_index=True, sort=False)
+    # Reuse connections across all requests
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=max_workers + max_years)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+
+    years = list(range(startyear, endyear+1))
+    with ThreadPoolExecutor(max_workers=max_workers) as page_pool, \
+            ThreadPoolExecutor(max_workers=max_years) as year_pool:
+        year_futures = [year_pool.submit(get_boxofficemojo_year, session, limiter, page_pool, cache, year,
+                                         url_prefix+str(year)+url_suffix, base_url,
+                                         os.path.join(output_dir, 'raw_box_office_data_'+str(year)+'.csv')
+                                         if output_dir is not None else None)
+                        for year in years]
+        # Add each year's data to the final dataframe for output, in order
+        df = pd.concat([future.result() for future in year_futures], axis=0, ignore_index=True, sort=False)
+
+    session.close()
+    cache.close()
     return df
 
 def get_wiki_table(URL, table_list):
@@ -144,7 +400,9 @@ if __name__ == "__main__":
     box_office_url_suffix = '/?grossesOption=totalGrosses'
 
     # Get box office data
-    df = get_boxofficemojo_data(box_office_url_prefix, box_office_url_suffix, startyear=1991, endyear=2021)
+    # (each year's data is saved to data/raw_box_office_data_<year>.csv as soon as it's done)
+    df = get_boxofficemojo_data(box_office_url_prefix, box_office_url_suffix, startyear=1991, endyear=2021,
+                                output_dir='data', cache_path='data/box_office_title_cache.db')
 
     # Save dataframe to csv
     df.to_csv('data/raw_box_office_data.csv')
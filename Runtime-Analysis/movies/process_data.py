@@ -1,6 +1,7 @@
 import pandas as pd
 import re
 import numpy as np
+from yearly_data import load_yearly_data
 
 
 def process_wikipedia_data(streaming_df, startyear, endyear):
@@ -104,13 +105,40 @@ def runtime_regex_function(runtime):
     int_runtime = int(matches[0][1])*60+int(matches[0][3])
     return int_runtime
 
+# Matches 'hour' and 'minute' digits in a runtime string (same pattern as runtime_regex_function)
+RUNTIME_REGEX = re.compile(r"((\d*)\s*h\w*)?\D*((\d*)\s*m\w*)?")
+
+def parse_runtimes(runtimes):
+    '''
+    Converts a column of runtime strings (ex. '2 hr 15 min', '135 minutes', '1h 50m') to minutes, all at once
+    :param runtimes: (pandas series) movie runtimes
+    :return: (pandas series) runtimes in minutes, as nullable ints (missing if the runtime is blank or has no units)
+    '''
+    # Runtimes repeat a lot, so only parse each distinct runtime string once (missing runtimes get code -1)
+    codes, uniques = pd.factorize(runtimes)
+
+    # Match 'hour' and 'minute' digits in every distinct runtime string
+    matches = pd.Series(uniques.astype(str), dtype=object).str.extract(RUNTIME_REGEX)
+
+    # Convert digits to numbers, treating '' as 0 (like runtime_regex_function)
+    hours = pd.to_numeric(matches[1], errors='coerce').fillna(0).to_numpy()
+    minutes = pd.to_numeric(matches[3], errors='coerce').fillna(0).to_numpy()
+
+    # Only keep runtimes with an 'hour' or 'minute' part
+    has_units = (matches[0].notna() | matches[2].notna()).to_numpy()
+    unique_minutes = np.where(has_units, hours * 60 + minutes, np.nan)
+
+    # Map each runtime to its parsed value
+    parsed = np.append(unique_minutes, np.nan)[codes]
+    return pd.Series(parsed, index=runtimes.index, name=runtimes.name).astype('Int64')
+
 def convert_runtime(df):
     '''
     Takes df['runtime'] and converts runtime to minutes
     :param df: Pandas dataframe with a 'runtime' column
     :return: Pandas dataframe
     '''
-    df['runtime'] = df['runtime'].apply(runtime_regex_function)
+    df['runtime'] = parse_runtimes(df['runtime'])
     return df
 
 def process_boxoffice_data(startyear, endyear):
@@ -121,19 +149,11 @@ def process_boxoffice_data(startyear, endyear):
     :param endyear: (int)
     :return: df: Pandas dataframe containing all box office data from startyear to endyear
     '''
-    # Initialize aggregate df
-    df = pd.DataFrame()
-    for year in range(startyear, endyear+1):
-        # Load streaming service data
-        annual_df = pd.read_csv('data/raw_box_office_data_'+str(year)+'.csv', index_col=0)
-        # Release year matches year on file
-        annual_df['release year'] = year
-        # Drop irrelevant columns
-        annual_df = annual_df.drop(columns=['release date'])
-        # Remove rows with blank entry for 'runtime'
-        annual_df = annual_df.dropna(subset=['runtime'])
-        # Add data to aggregate df
-        df = pd.concat([df, annual_df], axis=0, ignore_index=True, sort=False)
+    # Load every year's data at once, with the release year matching the year on file,
+    # and remove rows with blank entry for 'runtime' as each file is read
+    df = load_yearly_data('data/raw_box_office_data_{year}.csv', startyear, endyear,
+                          usecols=['title', 'runtime'], dtype={'title': str, 'runtime': str}, year_col='release year',
+                          row_filter=lambda annual_df, year: annual_df.dropna(subset=['runtime']))
 
     # Convert runtime to minutes
     df = convert_runtime(df)
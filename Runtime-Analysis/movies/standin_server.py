@@ -0,0 +1,173 @@
+import argparse
+import os
+import random
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse
+import requests
+from movies.get_data import BOX_OFFICE_MOJO_URL, HostRateLimiter, get_page, parse_year_page
+
+# Local stand-in for Box Office Mojo that replays saved year and title pages, so the crawl in get_data.py can be run
+# and tested offline. Save the pages once, then serve them (from the Runtime-Analysis folder):
+#   python -m movies.standin_server save 1991 2021
+#   python -m movies.standin_server serve
+# and pass url_prefix='http://127.0.0.1:8000/year/' and base_url='http://127.0.0.1:8000' to get_boxofficemojo_data
+
+def page_path(page_dir, url):
+    '''
+    Get the file a page is saved to (query strings are ignored, ex. '/release/rl1234/?ref_=bo_yld_table_1'
+    -> <page_dir>/release/rl1234.html)
+    :param page_dir: (string) directory of saved pages
+    :param url: (string) page url or link
+    :return: (string) file path
+    '''
+    return os.path.join(page_dir, *urlparse(url).path.strip('/').split('/')) + '.html'
+
+def save_pages(startyear, endyear, page_dir, url_suffix='/?grossesOption=totalGrosses', base_url=BOX_OFFICE_MOJO_URL,
+               limiter=None):
+    '''
+    Save each year page and every title page it links to (pages that are already saved aren't fetched again)
+    :param startyear: (int) first year
+    :param endyear: (int) last year (included)
+    :param page_dir: (string) directory that pages are saved to
+    :param url_suffix: (string) year page url suffix
+    :param base_url: (string) Box Office Mojo url
+    :param limiter: (HostRateLimiter) rate limiter (None = 5 requests per second)
+    :return: num_saved: (int) number of pages fetched and saved
+    '''
+    limiter = limiter or HostRateLimiter()
+    session = requests.Session()
+    num_saved = 0
+
+    def save(url):
+        path = page_path(page_dir, url)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            html = get_page(session, limiter, base_url + url)
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(html)
+            return True
+        return False
+
+    for year in range(startyear, endyear + 1):
+        print("Saving " + str(year) + " pages...")
+        year_url = '/year/' + str(year) + url_suffix
+        num_saved += save(year_url)
+        with open(page_path(page_dir, year_url), encoding='utf-8') as f:
+            title_urls = parse_year_page(f.read())
+        num_saved += sum(save(title_url) for title_url in title_urls)
+
+    session.close()
+    return num_saved
+
+class ServerStats:
+    '''
+    Request counts and fault settings shared by all request handlers
+    '''
+    def __init__(self, rate=None, failure_rate=0.0, latency=0.0):
+        '''
+        :param rate: (float) max number of requests per second before 429s are returned (None = no limit)
+        :param failure_rate: (float) share of requests that get a 503 error, to exercise retries
+        :param latency: (float) seconds to wait before each response
+        '''
+        self.rate = rate
+        self.failure_rate = failure_rate
+        self.latency = latency
+        self.num_requests = 0
+        self.num_rejected = 0
+        self.recent = []
+        self.lock = threading.Lock()
+
+    def check(self):
+        '''
+        Count a request
+        :return: (int) status code to send instead of the page (None = send the page)
+        '''
+        with self.lock:
+            now = time.monotonic()
+            self.num_requests += 1
+            # Keep the times of the requests in the last second
+            self.recent = [t for t in self.recent if now - t < 1] + [now]
+            if self.rate is not None and len(self.recent) > self.rate:
+                self.num_rejected += 1
+                return 429
+            if random.random() < self.failure_rate:
+                return 503
+        return None
+
+def make_handler(page_dir, stats):
+    '''
+    :param page_dir: (string) directory of saved pages
+    :param stats: (ServerStats) request counts and fault settings
+    :return: (class) request handler for the stand-in server
+    '''
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            time.sleep(stats.latency)
+            status = stats.check()
+            path = page_path(page_dir, self.path)
+
+            if status is None and not os.path.exists(path):
+                status = 404
+            if status is not None:
+                self.send_response(status)
+                if status == 429:
+                    self.send_header('Retry-After', '1')
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+
+            with open(path, 'rb') as f:
+                body = f.read()
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            # Don't print a line for every request
+            pass
+
+    return Handler
+
+def create_server(page_dir, host='127.0.0.1', port=8000, rate=None, failure_rate=0.0, latency=0.0):
+    '''
+    Create the stand-in server (call serve_forever on it, or run it on a thread with serve_forever as the target).
+    The server's stats attribute counts the requests it received and rejected
+    :param page_dir: (string) directory of saved pages
+    :param host: (string) host to listen on
+    :param port: (int) port to listen on (0 = any free port)
+    :param rate: (float) max number of requests per second before 429s are returned (None = no limit)
+    :param failure_rate: (float) share of requests that get a 503 error, to exercise retries
+    :param latency: (float) seconds to wait before each response
+    :return: server: (ThreadingHTTPServer) the server
+    '''
+    stats = ServerStats(rate, failure_rate, latency)
+    server = ThreadingHTTPServer((host, port), make_handler(page_dir, stats))
+    server.stats = stats
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Save Box Office Mojo pages, or replay them from a local server')
+    parser.add_argument('--page-dir', default='data/boxofficemojo_pages', help='directory of saved pages')
+    commands = parser.add_subparsers(dest='command', required=True)
+    save_parser = commands.add_parser('save', help='save year pages and the title pages they link to')
+    save_parser.add_argument('startyear', type=int)
+    save_parser.add_argument('endyear', type=int)
+    serve_parser = commands.add_parser('serve', help='replay saved pages')
+    serve_parser.add_argument('--port', type=int, default=8000)
+    serve_parser.add_argument('--rate', type=float, help='max requests per second before 429s are returned')
+    serve_parser.add_argument('--failure-rate', type=float, default=0.0, help='share of requests that get a 503')
+    serve_parser.add_argument('--latency', type=float, default=0.0, help='seconds to wait before each response')
+    args = parser.parse_args()
+
+    if args.command == 'save':
+        print("Saved " + str(save_pages(args.startyear, args.endyear, args.page_dir)) + " pages")
+    else:
+        server = create_server(args.page_dir, port=args.port, rate=args.rate, failure_rate=args.failure_rate,
+                               latency=args.latency)
+        print('Serving ' + args.page_dir + ' at http://127.0.0.1:' + str(args.port))
+        server.serve_forever()
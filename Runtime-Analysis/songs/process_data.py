@@ -1,4 +1,38 @@
 import pandas as pd
+from yearly_data import load_yearly_data
+
+
+def process_songs(spotify_df, playlist_year, startyear, endyear):
+    '''
+    Process one year's song data
+    :param spotify_df: Pandas dataframe with one playlist year's raw song data
+    :param playlist_year: (int) playlist year
+    :param startyear: (int) Starting year for analysis
+    :param endyear: (int) End year for analysis
+    :return: spotify_df: Pandas dataframe with processed song data
+    '''
+    # Convert duration from milliseconds to seconds
+    spotify_df['duration'] = spotify_df['duration_ms']/1000
+    spotify_df = spotify_df.drop(columns=['duration_ms'])
+
+    # Create new column for release year (release dates start with the year) and remove release date column,
+    # dropping songs with no release date
+    spotify_df['release year'] = pd.to_numeric(spotify_df['release date'].str[:4], errors='coerce')
+    spotify_df = spotify_df.dropna(subset=['release year']).drop(columns=['release date'])
+    spotify_df['release year'] = spotify_df['release year'].astype(int)
+
+    # Remove songs that were released more than 1 year before or after the playlist year
+    # (this indicates that the version of the song listed on Spotify is likely a re-release,
+    # and re-releases are excluded for simplicity)
+    spotify_df = spotify_df[(spotify_df['release year'] - playlist_year < 2) &
+                            (spotify_df['release year'] - playlist_year > -2)]
+    spotify_df = spotify_df.drop(columns=['playlist_year'])
+
+    # Filter for songs released within the analysis period
+    spotify_df = spotify_df[(spotify_df['release year'] >= startyear) &
+                            (spotify_df['release year'] <= endyear)]
+
+    return spotify_df
 
 
 if __name__ == "__main__":
@@ -10,35 +44,14 @@ if __name__ == "__main__":
     Process song data and aggregate it into one dataframe
     '''
 
-    # Initialize aggregate df
-    df = pd.DataFrame()
-    for year in range(startyear, endyear+1):
-        # Load song data
-        spotify_df = pd.read_csv('data/raw_spotify_data_'+str(year)+'.csv', index_col=0)
-
-        # Convert duration from milliseconds to seconds
-        spotify_df['duration'] = spotify_df['duration_ms']/1000
-        spotify_df = spotify_df.drop(columns=['duration_ms'])
-
-        # Convert release date to a datetime object
-        spotify_df['release date'] = pd.to_datetime(spotify_df['release date'])
-        # Create new column for release year and remove release date column
-        spotify_df['release year'] = spotify_df['release date'].dt.year
-        spotify_df = spotify_df.drop(columns=['release date'])
-
-        # Remove songs that were released more than 1 year before or after the playlist year
-        # (this indicates that the version of the song listed on Spotify is likely a re-release,
-        # and re-releases are excluded for simplicity)
-        spotify_df = spotify_df[(spotify_df['release year'] - spotify_df['playlist_year'] < 2) &
-                                (spotify_df['release year'] - spotify_df['playlist_year'] > -2)]
-        spotify_df = spotify_df.drop(columns=['playlist_year'])
-
-        # Filter for songs released within the analysis period
-        spotify_df = spotify_df[(spotify_df['release year'] >= startyear) &
-                                (spotify_df['release year'] <= endyear)]
-
-        # Add data to aggregate df
-        df = pd.concat([df, spotify_df], axis=0, ignore_index=True, sort=False)
+    # Load every year's song data at once (the playlist year matches the year on file),
+    # processing and filtering each file as it's read
+    df = load_yearly_data('data/raw_spotify_data_{year}.csv', startyear, endyear,
+                          usecols=['playlist_url', 'track_uri', 'title', 'release date', 'duration_ms'],
+                          dtype={'playlist_url': str, 'track_uri': str, 'title': str, 'release date': str,
+                                 'duration_ms': float},
+                          year_col='playlist_year',
+                          row_filter=lambda spotify_df, year: process_songs(spotify_df, year, startyear, endyear))
 
     # Reset index
     df = df.reset_index(drop=True)
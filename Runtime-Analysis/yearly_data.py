@@ -0,0 +1,56 @@
+import pandas as pd
+import glob
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+def find_year_files(path_pattern, startyear, endyear):
+    '''
+    Find the per-year files between startyear and endyear
+    :param path_pattern: (string) file path with '{year}' in place of the year (ex. 'data/raw_spotify_data_{year}.csv')
+    :param startyear: (int) first year
+    :param endyear: (int) last year (included)
+    :return: year_files: (dictionary) year -> file path, in order of year
+    '''
+    prefix, suffix = path_pattern.split('{year}')
+    year_files = {}
+    for path in glob.glob(glob.escape(prefix) + '[0-9][0-9][0-9][0-9]' + glob.escape(suffix)):
+        year = int(re.fullmatch(re.escape(prefix) + r'(\d{4})' + re.escape(suffix), path).group(1))
+        if startyear <= year <= endyear:
+            year_files[year] = path
+
+    return dict(sorted(year_files.items()))
+
+def load_yearly_data(path_pattern, startyear, endyear, usecols=None, dtype=None, year_col='year', row_filter=None,
+                     max_workers=8):
+    '''
+    Load the per-year files between startyear and endyear in parallel threads and concatenate them once
+    :param path_pattern: (string) file path with '{year}' in place of the year (ex. 'data/raw_spotify_data_{year}.csv')
+    :param startyear: (int) first year
+    :param endyear: (int) last year (included)
+    :param usecols: (list of strings) columns to read (None = all columns)
+    :param dtype: (dictionary) column -> data type
+    :param year_col: (string) column that each file's year is saved to
+    :param row_filter: (function) takes a file's dataframe and its year, returns the processed/filtered dataframe
+                       (applied as each file is read, None = keep every row)
+    :param max_workers: (int) max number of files read at once
+    :return: df: Pandas dataframe with the data from every file, in order of year
+    '''
+    year_files = find_year_files(path_pattern, startyear, endyear)
+
+    def read_year(year, path):
+        # Load the year's data and tag it with its year
+        annual_df = pd.read_csv(path, usecols=usecols, dtype=dtype)
+        annual_df[year_col] = year
+        # Process and filter the year's data
+        if row_filter is not None:
+            annual_df = row_filter(annual_df, year)
+        return annual_df
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        frames = list(executor.map(read_year, year_files.keys(), year_files.values()))
+
+    if not frames:
+        return pd.DataFrame(columns=list(usecols or []) + [year_col])
+
+    # Add every year's data to the aggregate df at once
+    return pd.concat(frames, axis=0, ignore_index=True, sort=False)
@@ -1,5 +1,6 @@
 import pandas as pd
 import numpy as np
+from scipy.signal import find_peaks, peak_prominences, peak_widths
 
 def process_data(info_df, wiki_data):
     '''
@@ -172,6 +173,98 @@ def get_mode(film_data, release_dt):
     return earliest_dt
 
 
+def get_peaks(info_df, wiki_data, min_prominence=5000, min_width=1, decay_rel_height=0.9):
+    '''
+    For every film, find all prominent peaks in daily pageviews on & after its release date
+    (ex. the release itself, a re-release, an award-season bump or a sequel announcement).
+    All films are searched in one batched pass: each film's post-release pageviews are laid end to end in a single
+    array, separated by +inf so that no peak, base or width can cross from one film into the next. A peak on the
+    release date itself is also found, with its prominence and width measured from its right side only
+    :param info_df: (pandas dataframe) contains each film's release date and release platform
+    :param wiki_data: (pandas dataframe) contains wikipedia daily pageviews, one column per film
+    :param min_prominence: (float) minimum prominence (in daily pageviews) for a peak to be recorded
+    :param min_width: (float) minimum width (in days, measured at half prominence) for a peak to be recorded
+    :param decay_rel_height: (float) share of a peak's prominence that must be shed for the peak to count as decayed
+                              (ex. 0.9 = the day when daily pageviews have fallen 90% of the way back to the peak's base)
+    :return: peaks_df: (pandas dataframe) contains one row per peak with its date, height, prominence,
+                        days since the release date and days to decay
+    '''
+    # Convert dates to datetime
+    release_dts = pd.to_datetime(info_df['release_dt'])
+    wiki_data = wiki_data.copy()
+    wiki_data.index = pd.to_datetime(wiki_data.index)
+
+    # Sort index and line up the pageview columns with info_df
+    wiki_data = wiki_data.sort_index()
+    movies = info_df.index.tolist()
+    pageviews = wiki_data[movies].to_numpy(dtype=float)
+    num_days, num_movies = pageviews.shape
+
+    # Day number of each row, so that gaps in the index are counted as days
+    day_num = ((wiki_data.index - wiki_data.index[0]) / np.timedelta64(1, 'D')).to_numpy(dtype=float)
+
+    # Keep each film's data on & after its release date, add a pad row before each film and a separator row after it
+    keep = (wiki_data.index.to_numpy()[:, None] >= release_dts.to_numpy()[None, :]) & ~np.isnan(pageviews)
+    keep = np.vstack([np.ones((1, num_movies), dtype=bool), keep, np.ones((1, num_movies), dtype=bool)])
+    values = np.vstack([np.full((1, num_movies), -np.inf), pageviews, np.full((1, num_movies), np.inf)])
+    rows, cols = np.indices(values.shape)
+
+    # Flatten film by film (column-major) into one array, with row numbers of the pageview data starting at 0
+    flat_values = values.T[keep.T]
+    flat_rows = rows.T[keep.T] - 1
+    flat_cols = cols.T[keep.T]
+    is_data = (flat_rows >= 0) & (flat_rows < num_days)
+    flat_days = np.where(is_data, day_num[np.clip(flat_rows, 0, num_days - 1)], np.nan)
+
+    # Find all local maxima, ignoring the pads and separators. The pads are -inf here, so that a peak on the
+    # release date still has a lower left neighbour
+    peaks, _ = find_peaks(flat_values)
+    peaks = peaks[is_data[peaks]]
+
+    # Measure peaks with each pad set to its film's first day instead, so that the pad can't become a peak's base.
+    # Peaks on the release date have no data on their left, so their base is the lowest point between them and the
+    # next higher point on their right (the -inf pad gives exactly that base), and their width starts at the peak
+    pad_positions = np.flatnonzero(flat_rows == -1)
+    low_values = flat_values.copy()
+    flat_values[pad_positions] = flat_values[pad_positions + 1]
+    on_release = ~is_data[peaks - 1]
+    prominences = np.empty(len(peaks))
+    left_bases = np.empty(len(peaks), dtype=np.intp)
+    right_bases = np.empty(len(peaks), dtype=np.intp)
+    prominences[~on_release], left_bases[~on_release], right_bases[~on_release] = \
+        peak_prominences(flat_values, peaks[~on_release])
+    prominences[on_release], _, right_bases[on_release] = peak_prominences(low_values, peaks[on_release])
+    left_bases[on_release] = peaks[on_release]
+
+    # Keep peaks that are prominent and wide enough
+    widths = peak_widths(flat_values, peaks, rel_height=0.5, prominence_data=(prominences, left_bases, right_bases))[0]
+    selected = (prominences >= min_prominence) & (widths >= min_width)
+    peaks = peaks[selected]
+    prominence_data = (prominences[selected], left_bases[selected], right_bases[selected])
+
+    # Get the (interpolated) position where each peak has decayed
+    decay_ips = peak_widths(flat_values, peaks, rel_height=decay_rel_height, prominence_data=prominence_data)[3]
+
+    # Convert positions in the flattened array to days
+    positions = np.flatnonzero(is_data)
+    decay_days = np.interp(decay_ips, positions, flat_days[positions])
+    peak_dts = wiki_data.index[flat_rows[peaks]]
+    release_dt = release_dts.to_numpy()[flat_cols[peaks]]
+
+    # Save peak data to dataframe
+    peaks_df = pd.DataFrame({'movie': np.asarray(movies, dtype=object)[flat_cols[peaks]],
+                             'peak_dt': peak_dts,
+                             'peak_pageviews': flat_values[peaks],
+                             'prominence': prominence_data[0],
+                             'days_since_release': ((peak_dts - release_dt) / np.timedelta64(1, 'D')).astype(int),
+                             'days_to_decay': decay_days - flat_days[peaks]})
+
+    # Number each film's peaks in chronological order
+    peaks_df['peak_num'] = peaks_df.groupby('movie').cumcount() + 1
+
+    return peaks_df
+
+
 if __name__ == "__main__":
     # Load data
     info_df = pd.read_csv('data/release_dates_v2.csv', index_col=0)
@@ -189,3 +282,17 @@ if __name__ == "__main__":
     # Save processed data
     movie_analysis.to_csv('data/processed_movie_data.csv')
     summary_df.to_csv('data/processed_summarized_data.csv')
+
+    # Find all prominent peaks for each film
+    peaks_df = get_peaks(info_df, wiki_data)
+
+    # Check that each film's highest peak is the max # of pageviews found by get_datapoints
+    # (including films whose pageviews were highest on the release date)
+    highest_peaks = peaks_df.loc[peaks_df.groupby('movie')['peak_pageviews'].idxmax()].set_index('movie')
+    mismatches = highest_peaks.index[highest_peaks['peak_dt'] != movie_analysis.loc[highest_peaks.index,
+                                                                                    'max_pageviews_dt']]
+    if len(mismatches) > 0:
+        print("highest peak doesn't match max pageviews date for: " + ', '.join(mismatches))
+
+    # Save peak data
+    peaks_df.to_csv('data/processed_peak_data.csv')
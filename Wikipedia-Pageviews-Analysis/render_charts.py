@@ -0,0 +1,174 @@
+import matplotlib
+# Use a non-interactive backend so charts can be rendered without a display (must be set before importing pyplot)
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+import matplotlib.dates as mdates
+from matplotlib.ticker import FuncFormatter
+import pandas as pd
+import numpy as np
+import hashlib
+import json
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+# Bump this whenever render_chart changes, so that charts rendered by an older version are redrawn
+CHART_VERSION = 1
+
+def render_chart(movie, dates, pageviews, release_dt, max_dt, mode_dt, path):
+    '''
+    Render daily pageviews for one film's Wikipedia article to an image file
+    :param movie: (string) Wikipedia article title
+    :param dates: (numpy array) dates of each daily pageview value
+    :param pageviews: (numpy array) daily pageviews
+    :param release_dt: (numpy datetime64) the film's release date
+    :param max_dt: (numpy datetime64) the date with the max # of daily pageviews (NaT to skip)
+    :param mode_dt: (numpy datetime64) the film's reversion date (NaT to skip)
+    :param path: (string) output file path; the file extension (ex. .png or .svg) sets the format
+    :return: path: (string) output file path
+    '''
+
+    '''
+    Plot data
+    '''
+    # Plot daily pageviews
+    fig, ax = plt.subplots(figsize=(10, 5))
+    ax.plot(dates, pageviews, color='#C0113D', marker='o', markersize=3, lw=1)
+
+    # Annotate the release date
+    ax.axvline(release_dt, alpha=1, color='#000000', linestyle='-', linewidth=1, label='Release Date')
+
+    # Annotate the date with the max # of daily pageviews
+    if not np.isnat(max_dt) and (dates == max_dt).any():
+        ax.plot(max_dt, pageviews[dates == max_dt][0], color='#000000', marker='v', markersize=8, linestyle='None',
+                label='Max Daily Pageviews')
+
+    # Annotate the time from the release date to the reversion date
+    if not np.isnat(mode_dt):
+        ax.axvspan(release_dt, mode_dt, alpha=0.2, color='#c75b77', linestyle='-', linewidth=None,
+                   label='Release Date to Reversion Date')
+
+    '''
+    Format graph
+    '''
+    # Set x-axis to date format
+    ax.xaxis.set_major_formatter(mdates.DateFormatter('%d-%b-%y'))
+    fig.autofmt_xdate()
+
+    # Set y-axis format
+    ax.set_ylim(bottom=0)
+    ax.yaxis.set_major_formatter(FuncFormatter(lambda x, p: format(int(x), ',')))
+
+    # Set title, axis labels and legend
+    ax.set_title('Daily Pageviews for ' + movie + "'s Wikipedia Article",
+                 fontdict={'fontsize': 14, 'fontweight': 'semibold'})
+    ax.set_xlabel('Date', fontdict={'fontsize': 11, 'fontweight': 'semibold'})
+    ax.set_ylabel('Total Daily Pageviews', fontdict={'fontsize': 11, 'fontweight': 'semibold'})
+    ax.legend(loc='upper right', fontsize=9)
+
+    # Save and close the figure so that memory doesn't build up in the worker
+    fig.savefig(path, bbox_inches='tight')
+    plt.close(fig)
+
+    return path
+
+def chart_hash(dates, pageviews, release_dt, max_dt, mode_dt, fmt):
+    '''
+    Hash all inputs to a chart, so unchanged charts can be skipped
+    :return: (string) hex digest
+    '''
+    hasher = hashlib.sha256()
+    hasher.update(str(CHART_VERSION).encode())
+    hasher.update(fmt.encode())
+    hasher.update(np.ascontiguousarray(dates.astype('datetime64[D]')).tobytes())
+    hasher.update(np.ascontiguousarray(pageviews, dtype=float).tobytes())
+    for dt in [release_dt, max_dt, mode_dt]:
+        hasher.update(str(dt).encode())
+
+    return hasher.hexdigest()
+
+def render_all_charts(daily_data, info_df, movie_results, movies=None, output_dir='charts', fmt='png',
+                      days_before=30, days_after=240, max_workers=None):
+    '''
+    Render a daily pageviews chart for each film, spread across worker processes.
+    Charts whose inputs haven't changed since they were last rendered are skipped
+    :param daily_data: (pandas dataframe) Daily Wikipedia pageviews, one column per film
+    :param info_df: (pandas dataframe) contains each film's release date
+    :param movie_results: (pandas dataframe) contains each film's max pageviews date and reversion date
+    :param movies: (list of strings) Wikipedia articles to render (None = every film in info_df)
+    :param output_dir: (string) directory where charts are saved
+    :param fmt: (string) image format, ex. 'png' or 'svg'
+    :param days_before: (int) number of days to plot before the release date
+    :param days_after: (int) number of days to plot after the release date
+    :param max_workers: (int) max number of processes (None = number of CPUs)
+    :return: rendered: (list of strings) paths of the charts that were (re)rendered
+    '''
+    # Convert dates to datetime
+    release_dts = pd.to_datetime(info_df['release_dt'])
+    max_dts = pd.to_datetime(movie_results['max_pageviews_dt'])
+    mode_dts = pd.to_datetime(movie_results['1st_mode_dt'])
+    daily_data = daily_data.copy()
+    daily_data.index = pd.to_datetime(daily_data.index)
+    daily_data = daily_data.sort_index()
+
+    if movies is None:
+        movies = info_df.index.tolist()
+
+    # Load the cache of input hashes for previously rendered charts
+    os.makedirs(output_dir, exist_ok=True)
+    cache_path = os.path.join(output_dir, 'chart_cache.json')
+    if os.path.exists(cache_path):
+        with open(cache_path) as f:
+            cache = json.load(f)
+    else:
+        cache = {}
+
+    # Render each chart that is new or has changed inputs
+    rendered = []
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = {}
+        for movie in movies:
+            # Get the film's data within the plotting window
+            release_dt = release_dts[movie]
+            film_data = daily_data.loc[(daily_data.index >= release_dt - pd.Timedelta(days=days_before)) &
+                                       (daily_data.index <= release_dt + pd.Timedelta(days=days_after)), movie]
+            dates = film_data.index.to_numpy()
+            pageviews = film_data.to_numpy(dtype=float)
+            chart_dts = [dt.to_datetime64() for dt in
+                         [release_dt, max_dts.get(movie, pd.NaT), mode_dts.get(movie, pd.NaT)]]
+
+            # Skip the chart if it exists and its inputs haven't changed
+            file_name = re.sub(r'[^\w\-]+', '_', movie).strip('_') + '.' + fmt
+            path = os.path.join(output_dir, file_name)
+            input_hash = chart_hash(dates, pageviews, *chart_dts, fmt)
+            if cache.get(file_name) == input_hash and os.path.exists(path):
+                continue
+
+            futures[file_name] = (input_hash, executor.submit(render_chart, movie, dates, pageviews, *chart_dts, path))
+
+        # Record the hash of each chart once it has been rendered
+        for file_name, (input_hash, future) in futures.items():
+            rendered.append(future.result())
+            cache[file_name] = input_hash
+
+    # Save the cache
+    with open(cache_path, 'w') as f:
+        json.dump(cache, f, indent=1, sort_keys=True)
+
+    return rendered
+
+
+if __name__ == "__main__":
+    # Load data
+    info_df = pd.read_csv('data/release_dates_v2.csv', index_col=0)
+    movie_results = pd.read_csv('data/processed_movie_data.csv', index_col=0)
+    wiki_df1 = pd.read_csv('data/2019 box office top 10_wiki pageviews.csv', index_col=0)
+    wiki_df2 = pd.read_csv('data/2022 box office top 10_wiki pageviews.csv', index_col=0)
+    wiki_df3 = pd.read_csv('data/netflix top 10 films - daily wikipedia pageviews.csv', index_col=0)
+
+    # Merge Wikipedia data into 1 dataframe
+    daily_data = pd.concat([wiki_df1, wiki_df2, wiki_df3], axis=1)
+
+    # Render a chart for every film
+    rendered = render_all_charts(daily_data, info_df, movie_results, output_dir='charts', fmt='png')
+    print('Rendered ' + str(len(rendered)) + ' charts')
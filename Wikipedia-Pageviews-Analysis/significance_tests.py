@@ -0,0 +1,134 @@
+import pandas as pd
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+
+def bootstrap_chunk(values_a, values_b, num_resamples, seed_seq):
+    '''
+    Bootstrap the mean of two samples, num_resamples times
+    :param values_a: (numpy array) values for the 1st category
+    :param values_b: (numpy array) values for the 2nd category
+    :param num_resamples: (int) number of resamples in this chunk
+    :param seed_seq: (numpy SeedSequence) seed for this chunk
+    :return: means_a, means_b: (numpy arrays) resampled means for each category
+    '''
+    rng = np.random.default_rng(seed_seq)
+
+    # Generate resamples as matrices of indices (one row per resample) and reduce each row to its mean
+    idx_a = rng.integers(0, len(values_a), size=(num_resamples, len(values_a)))
+    idx_b = rng.integers(0, len(values_b), size=(num_resamples, len(values_b)))
+    means_a = values_a[idx_a].mean(axis=1)
+    means_b = values_b[idx_b].mean(axis=1)
+
+    return means_a, means_b
+
+def permutation_chunk(pooled_values, num_a, observed_diff, num_resamples, seed_seq):
+    '''
+    Count the random relabellings of the pooled sample with a difference in means at least as extreme as observed
+    :param pooled_values: (numpy array) values for both categories
+    :param num_a: (int) number of values in the 1st category
+    :param observed_diff: (float) observed difference in means (1st category - 2nd category)
+    :param num_resamples: (int) number of permutations in this chunk
+    :param seed_seq: (numpy SeedSequence) seed for this chunk
+    :return: (int) number of permutations with |difference in means| >= |observed_diff|
+    '''
+    rng = np.random.default_rng(seed_seq)
+
+    # Generate permutations as a matrix of indices (one row per permutation)
+    perm_idx = np.argsort(rng.random((num_resamples, len(pooled_values))), axis=1)
+    permuted = pooled_values[perm_idx]
+
+    # The first num_a values of each row are relabelled as the 1st category
+    diffs = permuted[:, :num_a].mean(axis=1) - permuted[:, num_a:].mean(axis=1)
+
+    # Allow for floating point error so that ties with the observed difference are counted
+    return int(np.count_nonzero(np.abs(diffs) >= abs(observed_diff) - 1e-12))
+
+def compare_categories(values_a, values_b, num_resamples, seed_seq, executor, chunk_size):
+    '''
+    Calculate bootstrap confidence intervals and a permutation test p-value for the difference in means of 2 categories
+    :param values_a: (numpy array) values for the 1st category
+    :param values_b: (numpy array) values for the 2nd category
+    :param num_resamples: (int) number of bootstrap resamples and permutations
+    :param seed_seq: (numpy SeedSequence) seed for this comparison
+    :param executor: (ProcessPoolExecutor) process pool that the chunks are spread across
+    :param chunk_size: (int) number of resamples per chunk
+    :return: results: (dictionary) means, 95% confidence intervals and p-value
+    '''
+    # Split the resamples into chunks, each with its own seed, so results don't depend on the number of processes
+    chunk_sizes = [chunk_size] * (num_resamples // chunk_size)
+    if num_resamples % chunk_size:
+        chunk_sizes.append(num_resamples % chunk_size)
+    boot_seq, perm_seq = seed_seq.spawn(2)
+    boot_seeds = boot_seq.spawn(len(chunk_sizes))
+    perm_seeds = perm_seq.spawn(len(chunk_sizes))
+
+    observed_diff = values_a.mean() - values_b.mean()
+    pooled_values = np.concatenate([values_a, values_b])
+
+    # Run bootstrap and permutation chunks in parallel
+    boot_futures = [executor.submit(bootstrap_chunk, values_a, values_b, n, s)
+                    for n, s in zip(chunk_sizes, boot_seeds)]
+    perm_futures = [executor.submit(permutation_chunk, pooled_values, len(values_a), observed_diff, n, s)
+                    for n, s in zip(chunk_sizes, perm_seeds)]
+
+    # Collect results
+    means_a = np.concatenate([f.result()[0] for f in boot_futures])
+    means_b = np.concatenate([f.result()[1] for f in boot_futures])
+    num_extreme = sum(f.result() for f in perm_futures)
+
+    # Save results
+    results = {'mean_a': values_a.mean(), 'mean_b': values_b.mean(), 'diff': observed_diff}
+    for name, resampled in [('a', means_a), ('b', means_b), ('diff', means_a - means_b)]:
+        results[name + '_ci_low'], results[name + '_ci_high'] = np.percentile(resampled, [2.5, 97.5])
+    # Add 1 to the numerator and denominator so that the observed labelling is counted as one of the permutations
+    results['p_value'] = (num_extreme + 1) / (num_resamples + 1)
+
+    return results
+
+def significance_tests(movie_analysis, num_resamples=100000, seed=0, max_workers=None, chunk_size=10000):
+    '''
+    Compare streaming films against each set of theatrical films, using bootstrap confidence intervals
+    and permutation tests, for each data point in the summary
+    :param movie_analysis: (pandas dataframe) contains data points for each film (output of process_data)
+    :param num_resamples: (int) number of bootstrap resamples and permutations per comparison
+    :param seed: (int) random seed
+    :param max_workers: (int) max number of processes (None = number of CPUs)
+    :param chunk_size: (int) number of resamples per chunk sent to a process
+    :return: significance_df: (pandas dataframe) contains means, 95% confidence intervals and p-values
+    '''
+    # Label each film with its category, using the same categories as summary_df
+    release_yr = pd.to_datetime(movie_analysis['release_dt']).dt.year.astype(str)
+    group = movie_analysis['category'].where(movie_analysis['category'] == 'streaming',
+                                             release_yr + ' ' + movie_analysis['category'])
+
+    summary_cols = ['max_pageviews', 'days_to_max_pageviews', 'days_to_1st_mode_dt']
+    comparisons = [('streaming', '2019 theatrical'), ('streaming', '2022 theatrical')]
+
+    # Give each comparison of each data point its own independent seed
+    seed_seqs = iter(np.random.SeedSequence(seed).spawn(len(summary_cols) * len(comparisons)))
+
+    # Run each comparison, sharing one process pool
+    rows = {}
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        for datapoint in summary_cols:
+            for category_a, category_b in comparisons:
+                values_a = movie_analysis.loc[group == category_a, datapoint].dropna().to_numpy(dtype=float)
+                values_b = movie_analysis.loc[group == category_b, datapoint].dropna().to_numpy(dtype=float)
+                rows[(datapoint, category_a + ' vs ' + category_b)] = \
+                    compare_categories(values_a, values_b, num_resamples, next(seed_seqs), executor, chunk_size)
+
+    significance_df = pd.DataFrame.from_dict(rows, orient='index')
+    significance_df.index = pd.MultiIndex.from_tuples(significance_df.index, names=('data', 'comparison'))
+
+    return significance_df
+
+
+if __name__ == "__main__":
+    # Load data
+    movie_analysis = pd.read_csv('data/processed_movie_data.csv', index_col=0)
+
+    # Run significance tests
+    significance_df = significance_tests(movie_analysis)
+
+    # Save results
+    significance_df.to_csv('data/processed_significance_data.csv')